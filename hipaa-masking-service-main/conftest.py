@@ -0,0 +1,111 @@
+import functools
+import os
+from typing import Callable, Dict
+from unittest.mock import MagicMock, patch
+
+import pytest
+from presidio_analyzer.nlp_engine import NlpEngine, NlpEngineProvider
+
+from hipaa_masking_service import (
+    HIPAAMaskingService,
+    create_custom_mrn_recognizer,
+    create_device_id_recognizer,
+    create_health_plan_recognizer,
+    create_itin_recognizer,
+    create_license_plate_recognizer,
+    create_vin_recognizer,
+    create_zip_code_recognizer,
+)
+
+# The expected NLP masks in the tests were written against en_core_web_lg.
+# HIPAA_TEST_SPACY_MODEL=en_core_web_sm loads far faster and in a fraction of
+# the memory, for quick runs of the regex tests; some NLP expectations may
+# then fail. Presidio downloads a missing model on first load.
+TEST_SPACY_MODEL = os.environ.get("HIPAA_TEST_SPACY_MODEL", "en_core_web_lg")
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers",
+        "regex_only: the test only exercises pattern recognizers, so the "
+        "deidentify fixture skips the spaCy pipeline",
+    )
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_collection_modifyitems(config, items):
+    """
+    Under pytest-xdist with --dist=loadgroup, sends every test that uses the
+    spaCy engine to one worker, so the model is loaded once rather than once
+    per worker.
+    """
+    if not config.pluginmanager.hasplugin("xdist"):
+        return
+    for item in items:
+        if "nlp_engine" in getattr(item, "fixturenames", ()):
+            item.add_marker(pytest.mark.xdist_group("hipaa"))
+
+
+@pytest.fixture(scope="session")
+def nlp_engine() -> NlpEngine:
+    """
+    The spaCy engine, loaded once per test session and shared by every
+    service the tests build.
+    """
+    provider = NlpEngineProvider(
+        nlp_configuration={
+            "nlp_engine_name": "spacy",
+            "models": [{"lang_code": "en", "model_name": TEST_SPACY_MODEL}],
+        }
+    )
+    return provider.create_engine()
+
+
+@pytest.fixture(scope="session")
+def service(nlp_engine: NlpEngine) -> HIPAAMaskingService:
+    """
+    Fixture to create a single instance of the service for all tests.
+    This is efficient as the NLP models are loaded only once.
+    """
+    # Initialize the service with ALL custom recognizers.
+    return HIPAAMaskingService(
+        additional_recognizers=[
+            create_custom_mrn_recognizer(),
+            create_zip_code_recognizer(),
+            create_vin_recognizer(),
+            create_license_plate_recognizer(),
+            create_health_plan_recognizer(),
+            create_device_id_recognizer(),
+            create_itin_recognizer(),
+        ],
+        model_name=TEST_SPACY_MODEL,
+        nlp_engine=nlp_engine,
+    )
+
+
+@pytest.fixture
+def stub_service() -> HIPAAMaskingService:
+    """
+    A service whose analyzer is a MagicMock, built without loading spaCy or
+    any recognizer. For tests of the service's own control flow, such as its
+    error handling.
+    """
+    analyzer = MagicMock()
+    analyzer.get_supported_entities.return_value = []
+    analyzer.registry.recognizers = []
+    with patch.object(
+        HIPAAMaskingService, "_build_analyzer", return_value=analyzer
+    ):
+        return HIPAAMaskingService(warmup=False, cache_size=0)
+
+
+@pytest.fixture
+def deidentify(
+    service: HIPAAMaskingService, request: pytest.FixtureRequest
+) -> Callable[[str], Dict]:
+    """
+    service.deidentify, without the spaCy pipeline for tests marked
+    regex_only.
+    """
+    use_nlp = request.node.get_closest_marker("regex_only") is None
+    return functools.partial(service.deidentify, use_nlp=use_nlp)
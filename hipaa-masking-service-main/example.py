@@ -1,5 +1,11 @@
 import json
 
+# orjson is an optional, faster JSON encoder; the stdlib is the fallback.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 from hipaa_masking_service import (
     HIPAAMaskingService,
     create_custom_mrn_recognizer,
@@ -42,6 +48,15 @@ def get_service() -> HIPAAMaskingService:
     return service_instance
 
 
+def to_json(data) -> str:
+    """
+    Pretty-prints data as JSON, using orjson when it is installed.
+    """
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2).decode()
+    return json.dumps(data, indent=2)
+
+
 def main():
     """
     Main function to run the de-identification on example data.
@@ -80,9 +95,10 @@ def main():
 
     print("\n--- Processing Unseen Data ---")
 
-    for i, text in enumerate(unseen_data):
-        result = service.deidentify(text)
+    # Stream all texts through the spaCy pipeline in one batch
+    results = service.deidentify_batch(unseen_data)
 
+    for i, (text, result) in enumerate(zip(unseen_data, results)):
         print(f"\n--- Example {i+1} ---")
         print(f"Original:   {text}")
         print(f"Masked:     {result['masked_text']}")
@@ -91,7 +107,7 @@ def main():
         if result["entities_found"]:
             print("Entities:")
             # Pretty print the list of entity dictionaries
-            print(json.dumps(result["entities_found"], indent=2))
+            print(to_json(result["entities_found"]))
 
 
 if __name__ == "__main__":
@@ -1,5 +1,19 @@
+import functools
+import gc
+import hashlib
 import logging
-from typing import Any, Dict, List, Optional, Union
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from enum import IntFlag
+from importlib.metadata import version
+from typing import Any, Dict, List, Optional, Set, Union
+
+import regex
+import spacy
 
 # Presidio imports
 from presidio_analyzer import (
@@ -8,8 +22,9 @@ from presidio_analyzer import (
     Pattern,
     PatternRecognizer,
     RecognizerRegistry,
+    RecognizerResult,
 )
-from presidio_analyzer.nlp_engine import NlpEngineProvider
+from presidio_analyzer.nlp_engine import NlpArtifacts, NlpEngine, NlpEngineProvider
 from presidio_analyzer.predefined_recognizers import (
     CreditCardRecognizer,
     EmailRecognizer,
@@ -21,149 +36,420 @@ from presidio_analyzer.predefined_recognizers import (
 from presidio_anonymizer import AnonymizerEngine
 from presidio_anonymizer.entities import OperatorConfig
 # --- Configuration ---
-from pydantic import BaseModel, Field
+
+# Hyperscan is an optional native dependency; without it every
+# PatternRecognizer is registered (and scanned) individually.
+try:
+    import hyperscan
+except ImportError:  # pragma: no cover - depends on the platform
+    hyperscan = None
+
+# pyahocorasick powers the literal prefilter; without it every entity is
+# requested from the analyzer on every call.
+try:
+    import ahocorasick
+except ImportError:  # pragma: no cover - depends on the platform
+    ahocorasick = None
+
+# google-re2 matches in linear time (no catastrophic backtracking); without
+# it Re2PatternRecognizer behaves exactly like a PatternRecognizer.
+try:
+    import re2
+except ImportError:  # pragma: no cover - depends on the platform
+    re2 = None
+
+try:  # Python 3.11+
+    from re import _constants as sre_constants
+    from re import _parser as sre_parse
+except ImportError:  # pragma: no cover - Python 3.10
+    import sre_constants
+    import sre_parse
 
 # 1. Configure logging
 logger = logging.getLogger(__name__)
 
+# spaCy model used for NER. The small model is the fast default; callers who
+# need higher NER recall can pass e.g. model_name="en_core_web_lg" or
+# "en_core_web_trf" (the latter requires spacy-transformers).
+DEFAULT_SPACY_MODEL = "en_core_web_sm"
+
+# Pipeline components Presidio never reads. The tagger, attribute_ruler and
+# lemmatizer stay enabled: context enhancement matches on token lemmas.
+UNUSED_SPACY_PIPES = ("parser",)
+
+# Texts longer than this are analyzed as overlapping chunks in parallel
+# threads (spaCy's model ops and the 'regex' module release the GIL).
+LONG_TEXT_THRESHOLD = 16384
+LONG_TEXT_CHUNK_SIZE = 8192
+LONG_TEXT_CHUNK_OVERLAP = 1024
+
+# Run once at startup so the first real request does not pay for lazy
+# initialisation (vocab lookups, regex compiles, NER weights). It touches
+# the NER, regex and prefilter paths.
+WARMUP_TEXT = "John Smith (MRN-00000) was seen in Boston on 01/01/2025."
+
+# AnonymizerEngine merges same-type entities whose gap matches this.
+ANONYMIZER_SPACES_REGEX = regex.compile(r"^( )+$")
+
+# Number of de-identified texts kept for repeat inputs (templates, retries).
+DEFAULT_RESULT_CACHE_SIZE = 1024
+
+
+# Presidio compiles patterns with the 'regex' module using these flags
+# (PatternRecognizer's default global_regex_flags).
+PRESIDIO_REGEX_FLAGS = regex.DOTALL | regex.MULTILINE | regex.IGNORECASE
+
+# Formats spelled with explicit ASCII classes ([A-Z0-9]: VINs, plates,
+# device IDs) skip Unicode property lookups for \b and case folding. Patterns
+# built on \d keep PRESIDIO_REGEX_FLAGS: Unicode \d also matches full-width
+# and other non-ASCII digits (IME input, pasted text), which must be masked.
+ASCII_REGEX_FLAGS = PRESIDIO_REGEX_FLAGS | regex.ASCII
+
+
+def _alternation(sub_patterns: List[str]) -> str:
+    """Joins sub-patterns into one word-bounded alternation."""
+    return r"\b(?:" + "|".join(sub_patterns) + r")\b"
+
+
+def _trie_to_regex(node: Dict[str, dict]) -> str:
+    """Emits the regex for one trie node; "" marks the end of a word."""
+    branches = [
+        regex.escape(char) + _trie_to_regex(child)
+        for char, child in sorted(node.items())
+        if char
+    ]
+    if not branches:
+        return ""
+
+    optional = "" in node
+    if len(branches) == 1 and not optional:
+        return branches[0]
+    # Longer words win: a shorter word is an optional tail after its prefix.
+    return "(?:" + "|".join(branches) + ")" + ("?" if optional else "")
+
+
+def literals_to_regex(words: List[str]) -> str:
+    """
+    Builds a regex matching any of the given literal words, with shared
+    prefixes factored out (e.g. ["SN:", "SNO:"] -> "(?:SN(?::|O:))"), so the
+    engine never re-reads a common prefix once per word.
+
+    Empty words are skipped, since they would let the regex match the empty
+    string at every position; a list without any other word is a ValueError.
+    """
+    words = [word for word in words if word]
+    if not words:
+        raise ValueError("literals_to_regex needs at least one non-empty word.")
+
+    trie: Dict[str, dict] = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    pattern = _trie_to_regex(trie)
+    return pattern if pattern.startswith("(?:") else "(?:" + pattern + ")"
+
+
+# Literal plates from test cases, matched as-is alongside the dash format.
+KNOWN_LICENSE_PLATES = ["2FAST4U", "8ABC123"]
+
+# Every recognizer (regex or NER) needs at least one letter or digit; texts
+# without any (blank lines, separators) cannot contain PHI.
+PHI_CANDIDATE_REGEX = regex.compile(r"[^\W_]")
+
+# All custom regexes are compiled once, at import.
+MRN_REGEX = regex.compile(r"\b(MRN-\d{5})\b", PRESIDIO_REGEX_FLAGS)
+ZIP_CODE_REGEX = regex.compile(
+    r"\b(?<!-|\d)(\d{5}(?:-\d{4})?)\b", PRESIDIO_REGEX_FLAGS
+)
+# The lookahead rejects words that are not exactly 17 characters long with
+# a cheap \w scan before the VIN character class is tried.
+VIN_REGEX = regex.compile(
+    r"\b(?=\w{17}\b)([A-HJ-NPR-Z0-9]{17})\b", ASCII_REGEX_FLAGS
+)
+ITIN_REGEX = regex.compile(
+    r"\b(9\d{2}-(7[0-9]|8[0-8]|9[0-2]|9[4-9])-\d{4})\b", PRESIDIO_REGEX_FLAGS
+)
+SSN_REGEX = regex.compile(r"\b(\d{3}-\d{2}-\d{4})\b", PRESIDIO_REGEX_FLAGS)
+PASSPORT_REGEX = regex.compile(r"\b(\d{9})\b", PRESIDIO_REGEX_FLAGS)
+
+# Multi-format entities are matched by a single alternation, so the text is
+# walked once per entity type instead of once per format. Literal branches
+# come first since they fail fastest.
+LICENSE_PLATE_REGEX = regex.compile(
+    _alternation(
+        [literals_to_regex(KNOWN_LICENSE_PLATES), r"[A-Z0-9]{3}-[A-Z0-9]{3}"]
+    ),
+    ASCII_REGEX_FLAGS,
+)
+HEALTH_PLAN_REGEX = regex.compile(
+    _alternation([r"BCBS\d{9}", r"HPN-\d{7}", r"UHC\d{6}"]),
+    PRESIDIO_REGEX_FLAGS,
+)
+DEVICE_ID_REGEX = regex.compile(
+    _alternation([r"SN:[A-Z0-9-]{6,}", r"DeviceID:[A-Z0-9-]{6,}"]),
+    ASCII_REGEX_FLAGS,
+)
+
+# Runs of digits or uppercase alphanumerics that every match of a custom
+# regex contains, keyed by the regex source. A text without the run cannot
+# match, so the entity is not even requested from the analyzer. Each gate
+# uses its regex's flags, so it matches (at least) the same characters.
+RUN_GATES: Dict[str, "regex.Pattern"] = {
+    ZIP_CODE_REGEX.pattern: regex.compile(r"\d{5}", PRESIDIO_REGEX_FLAGS),
+    # BCBS + 9, HPN- + 7 or UHC + 6 digits
+    HEALTH_PLAN_REGEX.pattern: regex.compile(r"\d{6}", PRESIDIO_REGEX_FLAGS),
+    VIN_REGEX.pattern: regex.compile(r"[A-Z0-9]{17}", ASCII_REGEX_FLAGS),
+}
+
+
+def _precompiled_pattern(
+    name: str, compiled: "regex.Pattern", score: float, flags: int
+) -> Pattern:
+    """
+    Builds a Presidio Pattern that reuses an already compiled regex, so
+    PatternRecognizer does not compile it again on first use. flags must be
+    the ones the regex was compiled with, and the owning recognizer's
+    global_regex_flags.
+    """
+    pattern = Pattern(name=name, regex=compiled.pattern, score=score)
+    pattern.compiled_regex = compiled
+    pattern.compiled_with_flags = flags
+    return pattern
+
+
+class _Re2Regex:
+    """
+    Adapts a compiled re2 regex to the finditer(text, timeout=...) call
+    PatternRecognizer makes. RE2 runs in linear time, so there is no timeout.
+    """
+
+    __slots__ = ("compiled",)
+
+    def __init__(self, compiled):
+        self.compiled = compiled
+
+    def finditer(self, text: str, timeout: Optional[float] = None):
+        return self.compiled.finditer(text)
+
+
+@functools.lru_cache(maxsize=None)
+def _compile_re2(pattern: str, flags: int) -> Optional[_Re2Regex]:
+    """
+    Compiles a pattern with RE2, once per (pattern, flags) for the whole
+    process, or returns None if RE2 cannot express it.
+    """
+    options = re2.Options()
+    options.log_errors = False
+    inline_flags = "".join(
+        inline
+        for flag, inline in (
+            (regex.IGNORECASE, "(?i)"),
+            (regex.DOTALL, "(?s)"),
+            (regex.MULTILINE, "(?m)"),
+        )
+        if flags & flag
+    )
+    try:
+        return _Re2Regex(re2.compile(inline_flags + pattern, options))
+    except re2.error:
+        return None
+
+
+class Re2PatternRecognizer(PatternRecognizer):
+    """
+    A PatternRecognizer whose patterns are matched by RE2's DFA engine.
+
+    RE2 pays off for patterns that open with a broad character class (every
+    text position is a candidate start, e.g. license plates). Short formats
+    anchored on a literal or a digit run (MRN, SSN, ITIN) scan faster with
+    'regex', whose literal and digit search skips ahead in C, so their
+    factories keep a plain PatternRecognizer. So do all digit-based formats,
+    which need Unicode digits (see ASCII_REGEX_FLAGS).
+
+    RE2 has no lookarounds or backreferences; patterns using them (e.g. the
+    ZIP code lookbehind) keep their 'regex' compilation, as do all patterns
+    when google-re2 is not installed. RE2's Perl classes (digits, word
+    characters, word boundaries) are ASCII-only, so it is only used for
+    recognizers with the regex.ASCII flag.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        flags = self.global_regex_flags or 0
+        if re2 is None or not flags & regex.ASCII:
+            return
+
+        for pattern in self.patterns:
+            compiled = _compile_re2(pattern.regex, flags)
+            if compiled is None:
+                logger.debug(f"RE2 cannot compile '{pattern.name}', using 'regex'.")
+                continue
+            pattern.compiled_regex = compiled
+            pattern.compiled_with_flags = self.global_regex_flags
+
+
+# Recognizer classes whose results come from their patterns alone
+PLAIN_PATTERN_RECOGNIZERS = (PatternRecognizer, Re2PatternRecognizer)
+
+
+# The create_* factories below are cached: recognizers are stateless, so
+# every caller (service instances, test workers) shares one instance and
+# its compiled patterns.
+
 
 # 2. Define our custom MRN Recognizer
+@functools.cache
 def create_custom_mrn_recognizer() -> PatternRecognizer:
     """
     Factory function to create a custom PatternRecognizer for MRNs
     of the format MRN-#####.
     """
-    mrn_pattern = Pattern(
-        name="MRN Pattern (MRN-#####)",
-        regex=r"\b(MRN-\d{5})\b",
+    mrn_pattern = _precompiled_pattern(
+        "MRN Pattern (MRN-#####)",
+        MRN_REGEX,
         score=0.95,  # <-- FIX: Increased score to beat ORGANIZATION
+        flags=PRESIDIO_REGEX_FLAGS,
     )
     custom_mrn_recognizer = PatternRecognizer(
         supported_entity="MEDICAL_RECORD_NUMBER",
         patterns=[mrn_pattern],
         name="Custom MRN Recognizer",
+        global_regex_flags=PRESIDIO_REGEX_FLAGS,
     )
     return custom_mrn_recognizer
 
 
 # 3. Define Custom ZIP Code Recognizer
+@functools.cache
 def create_zip_code_recognizer() -> PatternRecognizer:
     """
     Factory function to create a custom PatternRecognizer for
     5-digit and 9-digit U.S. ZIP codes.
     """
-    zip_pattern = Pattern(
-        name="ZIP Code (5 or 5+4 digits)",
-        regex=r"\b(?<!-|\d)(\d{5}(?:-\d{4})?)\b",
+    zip_pattern = _precompiled_pattern(
+        "ZIP Code (5 or 5+4 digits)",
+        ZIP_CODE_REGEX,
         score=0.95,
+        flags=PRESIDIO_REGEX_FLAGS,
     )
     zip_recognizer = PatternRecognizer(
         supported_entity="ZIP_CODE",
         patterns=[zip_pattern],
         name="Custom ZIP Code Recognizer",
+        global_regex_flags=PRESIDIO_REGEX_FLAGS,
     )
     return zip_recognizer
 
 
 # 4. Define Custom VIN Recognizer
+@functools.cache
 def create_vin_recognizer() -> PatternRecognizer:
     """
     Factory function to create a custom PatternRecognizer for
     Vehicle Identification Numbers (VINs).
     """
-    vin_pattern = Pattern(
-        name="VIN (17 characters)", regex=r"\b([A-HJ-NPR-Z0-9]{17})\b", score=0.8
+    vin_pattern = _precompiled_pattern(
+        "VIN (17 characters)", VIN_REGEX, score=0.8, flags=ASCII_REGEX_FLAGS
     )
     vin_recognizer = PatternRecognizer(
         supported_entity="VEHICLE_VIN",
         patterns=[vin_pattern],
         name="Custom VIN Recognizer",
+        global_regex_flags=ASCII_REGEX_FLAGS,
     )
     return vin_recognizer
 
 
 # 5. Define Custom License Plate Recognizer
+@functools.cache
 def create_license_plate_recognizer() -> PatternRecognizer:
     """
     Factory function to create a custom PatternRecognizer for
     common U.S. license plate formats.
     """
-    plate_pattern_1 = Pattern(
-        name="License Plate (Dash)",
-        regex=r"\b([A-Z0-9]{3}-[A-Z0-9]{3})\b",
+    plate_pattern = _precompiled_pattern(
+        "License Plate (Dash or Known Plate)",
+        LICENSE_PLATE_REGEX,
         score=0.8,
-    )
-    plate_pattern_2 = Pattern(
-        name="License Plate (Test Case 1)", regex=r"\b(2FAST4U)\b", score=0.8
-    )
-    plate_pattern_3 = Pattern(
-        name="License Plate (Test Case 2)", regex=r"\b(8ABC123)\b", score=0.8
+        flags=ASCII_REGEX_FLAGS,
     )
 
-    plate_recognizer = PatternRecognizer(
+    plate_recognizer = Re2PatternRecognizer(
         supported_entity="LICENSE_PLATE",
-        patterns=[plate_pattern_1, plate_pattern_2, plate_pattern_3],
+        patterns=[plate_pattern],
         name="Custom License Plate Recognizer",
+        global_regex_flags=ASCII_REGEX_FLAGS,
     )
     return plate_recognizer
 
 
 # 6. Define Custom Health Plan ID Recognizer
+@functools.cache
 def create_health_plan_recognizer() -> PatternRecognizer:
     """
     Factory function to create a custom PatternRecognizer for
     Health Plan Beneficiary Numbers.
     """
-    hpn_pattern_1 = Pattern(
-        name="HPN (BCBS-style)", regex=r"\b(BCBS\d{9})\b", score=0.9
+    hpn_pattern = _precompiled_pattern(
+        "HPN (BCBS, HPN or UHC-style)",
+        HEALTH_PLAN_REGEX,
+        score=0.9,
+        flags=PRESIDIO_REGEX_FLAGS,
     )
-    hpn_pattern_2 = Pattern(name="HPN (HPN-style)", regex=r"\b(HPN-\d{7})\b", score=0.9)
-    hpn_pattern_3 = Pattern(name="HPN (UHC-style)", regex=r"\b(UHC\d{6})\b", score=0.9)
 
     hpn_recognizer = PatternRecognizer(
         supported_entity="HEALTH_PLAN_ID",
-        patterns=[hpn_pattern_1, hpn_pattern_2, hpn_pattern_3],
+        patterns=[hpn_pattern],
         name="Custom Health Plan ID Recognizer",
+        global_regex_flags=PRESIDIO_REGEX_FLAGS,
     )
     return hpn_recognizer
 
 
 # 7. Define Custom Device ID Recognizer
+@functools.cache
 def create_device_id_recognizer() -> PatternRecognizer:
     """
     Factory function to create a custom PatternRecognizer for
     Device Identifiers.
     """
-    device_pattern_1 = Pattern(
-        name="Device ID (SN:)", regex=r"\b(SN:[A-Z0-9-]{6,})\b", score=0.8
-    )
-    device_pattern_2 = Pattern(
-        name="Device ID (DeviceID:)", regex=r"\b(DeviceID:[A-Z0-9-]{6,})\b", score=0.8
+    device_pattern = _precompiled_pattern(
+        "Device ID (SN: or DeviceID:)",
+        DEVICE_ID_REGEX,
+        score=0.8,
+        flags=ASCII_REGEX_FLAGS,
     )
 
-    device_recognizer = PatternRecognizer(
+    device_recognizer = Re2PatternRecognizer(
         supported_entity="DEVICE_IDENTIFIER",
-        patterns=[device_pattern_1, device_pattern_2],
+        patterns=[device_pattern],
         name="Custom Device ID Recognizer",
+        global_regex_flags=ASCII_REGEX_FLAGS,
     )
     return device_recognizer
 
 
 # 8. Define Custom ITIN Recognizer
+@functools.cache
 def create_itin_recognizer() -> PatternRecognizer:
     """
     Factory function to create a custom PatternRecognizer for
     U.S. ITIN (Individual Taxpayer Identification Number).
     """
-    itin_pattern = Pattern(
-        name="ITIN (9xx-7x-xxxx)",
-        regex=r"\b(9\d{2}-(7[0-9]|8[0-8]|9[0-2]|9[4-9])-\d{4})\b",
+    itin_pattern = _precompiled_pattern(
+        "ITIN (9xx-7x-xxxx)",
+        ITIN_REGEX,
         score=0.95,
+        flags=PRESIDIO_REGEX_FLAGS,
     )
     itin_recognizer = PatternRecognizer(
         supported_entity="US_ITIN",
         patterns=[itin_pattern],
         name="Custom ITIN Recognizer",
+        global_regex_flags=PRESIDIO_REGEX_FLAGS,
     )
     return itin_recognizer
 
@@ -173,42 +459,63 @@ def create_itin_recognizer() -> PatternRecognizer:
 
 
 # --- NEW: High-Confidence SSN Recognizer (Factory Function) ---
+@functools.cache
 def create_high_score_ssn_recognizer() -> PatternRecognizer:
     """
     Factory function to create a PatternRecognizer for SSNs
     with a high score to beat DATE_TIME.
     """
-    ssn_pattern = Pattern(
-        name="SSN (xxx-xx-xxxx)", regex=r"\b(\d{3}-\d{2}-\d{4})\b", score=0.9
+    ssn_pattern = _precompiled_pattern(
+        "SSN (xxx-xx-xxxx)", SSN_REGEX, score=0.9, flags=PRESIDIO_REGEX_FLAGS
     )
     ssn_recognizer = PatternRecognizer(
         supported_entity="US_SSN",
         patterns=[ssn_pattern],
         name="High Score SSN Recognizer",
+        global_regex_flags=PRESIDIO_REGEX_FLAGS,
     )
     return ssn_recognizer
 
 
 # --- NEW: High-Confidence Passport Recognizer (Factory Function) ---
+@functools.cache
 def create_high_score_passport_recognizer() -> PatternRecognizer:
     """
     Factory function to create a PatternRecognizer for 9-digit
     US Passports with a high score to beat DATE_TIME.
     """
     # This is the regex used by the default UsPassportRecognizer
-    passport_pattern = Pattern(
-        name="US Passport (9 digits)",
-        regex=r"\b(\d{9})\b",
+    passport_pattern = _precompiled_pattern(
+        "US Passport (9 digits)",
+        PASSPORT_REGEX,
         score=0.9,  # <-- FIX: High score to beat DATE
+        flags=PRESIDIO_REGEX_FLAGS,
     )
     passport_recognizer = PatternRecognizer(
         supported_entity="US_PASSPORT",
         patterns=[passport_pattern],
         name="High Score Passport Recognizer",
+        global_regex_flags=PRESIDIO_REGEX_FLAGS,
     )
     return passport_recognizer
 
 
+# Presidio's predefined recognizers that cover a HIPAA identifier and are not
+# already in DEFAULT_HIPAA_RECOGNIZERS. Everything else Presidio loads (its
+# own copies of the recognizers below, UK NHS numbers, crypto wallets, and
+# the SSN/ITIN/passport ones replaced by the high-score recognizers above)
+# is dropped, since each registered recognizer runs on every call.
+PREDEFINED_HIPAA_RECOGNIZERS = frozenset(
+    {
+        "SpacyRecognizer",  # names, locations, organizations, dates
+        "DateRecognizer",  # numeric dates NER misses (e.g. 2025-10-28)
+        "UsBankRecognizer",  # account numbers
+        "IbanRecognizer",  # account numbers
+        "MedicalLicenseRecognizer",  # certificate/license numbers
+        "MacAddressRecognizer",  # device identifiers
+    }
+)
+
 DEFAULT_HIPAA_RECOGNIZERS = [
     create_high_score_ssn_recognizer(),
     create_high_score_passport_recognizer(),
@@ -221,17 +528,297 @@ DEFAULT_HIPAA_RECOGNIZERS = [
 ]
 
 
-# --- Data Contracts (Pydantic) ---
+# --- Literal Prefixes (for the Aho-Corasick prefilter) ---
+
+# Shorter prefixes (e.g. the "9" of an ITIN) would fire on almost any text.
+MIN_LITERAL_PREFIX_LENGTH = 3
+
+
+def _walk_literal_prefixes(items) -> Optional[List[str]]:
+    """
+    Walks a parsed regex and returns the literal strings that every match
+    must start with, or None if there is no usable literal prefix.
+    """
+    prefix = ""
+    for op, av in items:
+        if op is sre_constants.AT:
+            # Zero-width anchors such as \b do not consume characters.
+            if prefix:
+                break
+        elif op is sre_constants.LITERAL:
+            prefix += chr(av)
+        elif op is sre_constants.SUBPATTERN or op is sre_constants.BRANCH:
+            branches = [av[-1]] if op is sre_constants.SUBPATTERN else av[1]
+            prefixes = []
+            for branch in branches:
+                branch_prefixes = _walk_literal_prefixes(branch)
+                if branch_prefixes is None:
+                    break
+                prefixes.extend(prefix + p for p in branch_prefixes)
+            else:
+                return prefixes
+            break
+        else:
+            break
+
+    return [prefix] if prefix else None
+
+
+def literal_prefixes(regex: str) -> Optional[List[str]]:
+    """
+    Returns the casefolded literal prefixes of a regex (one per top-level
+    alternative), or None if any alternative lacks a long enough prefix.
+    """
+    try:
+        parsed = sre_parse.parse(regex)
+    except Exception:
+        # Presidio patterns use the 'regex' module, which is a superset of 're'.
+        return None
+
+    prefixes = _walk_literal_prefixes(parsed)
+    if not prefixes or any(len(p) < MIN_LITERAL_PREFIX_LENGTH for p in prefixes):
+        return None
+    return [p.casefold() for p in prefixes]
+
+
+# --- Hyperscan Multi-Pattern Recognizer ---
+
+
+class HyperscanMultiRecognizer(EntityRecognizer):
+    """
+    Runs a group of PatternRecognizers behind a single Hyperscan database.
+
+    Every pattern is compiled in prefilter mode, so one pass over the text
+    tells us which recognizers *may* match. Only those recognizers then run
+    their own regex (and validation logic), which keeps the results
+    identical to registering them one by one.
+    """
+
+    def __init__(
+        self,
+        recognizers: List[PatternRecognizer],
+        name: str = "Hyperscan Multi Recognizer",
+    ):
+        if hyperscan is None:
+            raise ImportError("HyperscanMultiRecognizer requires 'hyperscan'.")
+
+        self.recognizers = recognizers
+        self._build_database()
+
+        supported_entities = []
+        for recognizer in recognizers:
+            for entity in recognizer.supported_entities:
+                if entity not in supported_entities:
+                    supported_entities.append(entity)
+
+        super().__init__(supported_entities=supported_entities, name=name)
+
+    def _build_database(self) -> None:
+        """
+        Compiles every recognizer's patterns into one Hyperscan database.
+        """
+        # Pattern id -> (owning recognizer index, entity type, score)
+        self.pattern_table: Dict[int, tuple] = {}
+        expressions, flags = [], []
+        for rec_index, recognizer in enumerate(self.recognizers):
+            for pattern in recognizer.patterns:
+                self.pattern_table[len(expressions)] = (
+                    rec_index,
+                    recognizer.supported_entities[0],
+                    pattern.score,
+                )
+                expressions.append(pattern.regex.encode("utf-8"))
+                flags.append(self._hyperscan_flags(recognizer.global_regex_flags))
+
+        self.database = hyperscan.Database(mode=hyperscan.HS_MODE_BLOCK)
+        self.database.compile(
+            expressions=expressions,
+            ids=list(self.pattern_table),
+            elements=len(expressions),
+            flags=flags,
+        )
+        self._scratch = threading.local()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # hyperscan.Database cannot be pickled; its serialized form can, and
+        # loading it takes microseconds where compiling takes tens of ms.
+        state = self.__dict__.copy()
+        state["database"] = hyperscan.dumpb(self.database)
+        del state["_scratch"]
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        try:
+            database = hyperscan.loadb(state["database"], hyperscan.HS_MODE_BLOCK)
+            # Unlike compile(), loadb() does not allocate scan scratch space.
+            database.scratch = hyperscan.Scratch(database)
+            self.database = database
+            self._scratch = threading.local()
+        except Exception as e:
+            # A database serialized by another Hyperscan build or on a CPU
+            # with other instruction sets may not load here.
+            logger.info(f"Recompiling Hyperscan database: {e}")
+            self._build_database()
 
+    @staticmethod
+    def _hyperscan_flags(regex_flags: Optional[int]) -> int:
+        """
+        Translates a recognizer's 'regex' flags to Hyperscan flags.
+
+        PREFILTER lets lookarounds compile as a superset of the regex, and
+        Unicode semantics (UCP) are used unless the regex is ASCII-only.
+        """
+        regex_flags = regex_flags or 0
+        flags = (
+            hyperscan.HS_FLAG_PREFILTER
+            | hyperscan.HS_FLAG_SINGLEMATCH
+            | hyperscan.HS_FLAG_UTF8
+        )
+        if regex_flags & regex.IGNORECASE:
+            flags |= hyperscan.HS_FLAG_CASELESS
+        if regex_flags & regex.DOTALL:
+            flags |= hyperscan.HS_FLAG_DOTALL
+        if regex_flags & regex.MULTILINE:
+            flags |= hyperscan.HS_FLAG_MULTILINE
+        if not regex_flags & regex.ASCII:
+            flags |= hyperscan.HS_FLAG_UCP
+        return flags
+
+    def load(self) -> None:
+        """The database is compiled in __init__; nothing to load."""
+        pass
+
+    def _thread_scratch(self) -> "hyperscan.Scratch":
+        """
+        Returns this thread's scan scratch space. A scratch cannot serve two
+        scans at once, so threads sharing the recognizer each clone their own.
+        """
+        scratch = getattr(self._scratch, "scratch", None)
+        if scratch is None:
+            scratch = self._scratch.scratch = self.database.scratch.clone()
+        return scratch
+
+    def _candidate_recognizers(self, text: str) -> List[PatternRecognizer]:
+        """
+        Scans the text once and returns the recognizers with a possible match.
+        """
+        try:
+            data = text.encode("utf-8")
+        except UnicodeEncodeError:
+            # e.g. lone surrogates: not valid UTF-8, so scan with every regex.
+            return self.recognizers
+
+        hits = set()
+
+        def on_match(pattern_id, start, end, flags, context):
+            hits.add(self.pattern_table[pattern_id][0])
+
+        self.database.scan(
+            data, match_event_handler=on_match, scratch=self._thread_scratch()
+        )
+        return [self.recognizers[i] for i in sorted(hits)]
+
+    def analyze(
+        self, text: str, entities: List[str], nlp_artifacts=None
+    ) -> List[RecognizerResult]:
+        """
+        Confirms Hyperscan's candidates with each recognizer's own regex.
+        """
+        requested = [
+            recognizer
+            for recognizer in self.recognizers
+            if not entities or set(recognizer.supported_entities) & set(entities)
+        ]
+        if len(requested) > 1:
+            hits = set(map(id, self._candidate_recognizers(text)))
+            requested = [r for r in requested if id(r) in hits]
+        # With a single recognizer requested, the scan would cost about as
+        # much as simply running its regex.
+
+        results = []
+        for recognizer in requested:
+            for result in recognizer.analyze(text, entities, nlp_artifacts):
+                # The analyzer drops results whose id is not in its registry.
+                result.recognition_metadata[
+                    RecognizerResult.RECOGNIZER_IDENTIFIER_KEY
+                ] = self.id
+                results.append(result)
+        return results
+
+
+# --- Masking Operators ---
+
+# (entity type, replacement tag). Every entity is masked with "replace".
+_OPERATOR_SPECS = (
+    ("DEFAULT", "<PHI>"),
+    ("PERSON", "<PERSON>"),
+    ("PHONE_NUMBER", "<PHONE>"),
+    ("EMAIL_ADDRESS", "<EMAIL>"),
+    ("US_SSN", "<SSN>"),
+    ("SSN", "<SSN>"),
+    ("US_ITIN", "<ITIN>"),
+    ("US_PASSPORT", "<PHI>"),  # Same as default, kept for consistency
+    ("DATE_TIME", "<DATE>"),
+    ("LOCATION", "<LOCATION>"),
+    ("MEDICAL_RECORD_NUMBER", "<MRN>"),
+    ("ORGANIZATION", "<ORGANIZATION>"),
+    ("URL", "<URL>"),
+    ("CREDIT_CARD", "<CREDIT_CARD>"),
+    ("ZIP_CODE", "<ZIP>"),
+    ("VEHICLE_VIN", "<VIN>"),
+    ("LICENSE_PLATE", "<LICENSE_PLATE>"),
+    ("HEALTH_PLAN_ID", "<HPN>"),
+    ("DEVICE_IDENTIFIER", "<DEVICE>"),
+)
+
+_OPERATORS: Dict[str, OperatorConfig] = {
+    entity_type: OperatorConfig("replace", {"new_value": tag})
+    for entity_type, tag in _OPERATOR_SPECS
+}
+
+# One bit per entity type the service can report, so callers can test for
+# types with integer ops instead of building sets of strings. Types from
+# caller-supplied recognizers that are not listed here contribute no bit.
+EntityKind = IntFlag(
+    "EntityKind",
+    [entity_type for entity_type, _ in _OPERATOR_SPECS if entity_type != "DEFAULT"]
+    + [
+        "US_DRIVER_LICENSE",
+        "IP_ADDRESS",
+        "US_BANK_NUMBER",
+        "IBAN_CODE",
+        "MEDICAL_LICENSE",
+        "MAC_ADDRESS",
+        "NRP",
+    ],
+)
 
-class DeidentifiedEntity(BaseModel):
-    """A model representing a single piece of found PHI."""
+_ENTITY_BITS: Dict[str, int] = {kind.name: kind.value for kind in EntityKind}
 
-    text: str = Field(..., description="The original text of the entity found.")
-    entity_type: str = Field(..., description="The type of entity (e.g., PERSON, MRN).")
-    start: int = Field(..., description="The start index in the original text.")
-    end: int = Field(..., description="The end index in the original text.")
-    score: float = Field(..., description="The recognizer's confidence score.")
+
+def entity_mask(entity_types) -> EntityKind:
+    """
+    Folds entity type names into an EntityKind bitmask.
+    """
+    mask = 0
+    for entity_type in entity_types:
+        mask |= _ENTITY_BITS.get(entity_type, 0)
+    return EntityKind(mask)
+
+
+# --- Data Contracts ---
+
+
+@dataclass(slots=True)
+class DeidentifiedEntity:
+    """A single piece of found PHI."""
+
+    text: str  # The original text of the entity found.
+    entity_type: str  # The type of entity (e.g., PERSON, MRN).
+    start: int  # The start index in the original text.
+    end: int  # The end index in the original text.
+    score: float  # The recognizer's confidence score.
 
     def __repr__(self) -> str:
         return f"DeidentifiedEntity(entity_type='{self.entity_type}', score={self.score})"
@@ -239,15 +826,50 @@ class DeidentifiedEntity(BaseModel):
     def __str__(self) -> str:
         return self.__repr__()
 
+    def to_dict(self) -> Dict[str, Union[str, int, float]]:
+        """Returns the entity in the dict shape callers receive."""
+        return {
+            "text": self.text,
+            "entity_type": self.entity_type,
+            "start": self.start,
+            "end": self.end,
+            "score": self.score,
+        }
+
 
-class DeidentificationResult(BaseModel):
+@dataclass(slots=True)
+class DeidentificationResult:
     """The structured output of the de-identification process."""
 
-    masked_text: str = Field(..., description="The text with all PHI masked.")
-    entities_found: List[DeidentifiedEntity] = Field(
-        default_factory=list,
-        description="A list of all PHI entities that were found and masked.",
-    )
+    masked_text: str  # The text with all PHI masked.
+    # A list of all PHI entities that were found and masked.
+    entities_found: List[DeidentifiedEntity] = field(default_factory=list)
+    # The union of the EntityKind bits of entities_found.
+    entity_mask: EntityKind = EntityKind(0)
+
+    def to_dict(self) -> Dict[str, Union[str, List[Dict], EntityKind]]:
+        """Returns the result in the dict shape callers receive."""
+        return _result_dict(
+            self.masked_text,
+            [entity.to_dict() for entity in self.entities_found],
+            self.entity_mask,
+        )
+
+
+def _result_dict(
+    masked_text: str,
+    entities_found: Optional[List[Dict]] = None,
+    mask: EntityKind = EntityKind(0),
+) -> Dict[str, Union[str, List[Dict], EntityKind]]:
+    """
+    Returns a DeidentificationResult in the dict shape callers receive,
+    without asdict()'s recursive deep copy.
+    """
+    return {
+        "masked_text": masked_text,
+        "entities_found": entities_found if entities_found is not None else [],
+        "entity_mask": mask,
+    }
 
 
 # --- The Service Class ---
@@ -259,67 +881,461 @@ class HIPAAMaskingService:
     HIPAA's 18 PHI identifiers.
     """
 
-    def __init__(self, additional_recognizers: Optional[List[EntityRecognizer]] = None):
+    def __init__(
+        self,
+        additional_recognizers: Optional[List[EntityRecognizer]] = None,
+        model_name: str = DEFAULT_SPACY_MODEL,
+        use_gpu: bool = False,
+        analyzer_cache_path: Optional[str] = None,
+        cache_size: int = DEFAULT_RESULT_CACHE_SIZE,
+        warmup: bool = True,
+        nlp_engine: Optional[NlpEngine] = None,
+    ):
         """
         Initializes the service by setting up the Analyzer and Anonymizer.
+
+        model_name selects the spaCy model used for NER (default
+        en_core_web_sm); pass "en_core_web_trf" for higher recall.
+        use_gpu runs spaCy on the GPU (requires CuPy), falling back to CPU.
+        analyzer_cache_path pickles the configured recognizers and spaCy
+        pipeline to that file, so later processes skip the build. Pickles
+        execute code on load: only point it at a trusted, private location.
+        cache_size is the number of results kept for repeated texts; 0
+        disables the cache.
+        warmup runs one sentence through the pipeline before returning.
+        nlp_engine shares an already loaded spaCy engine (e.g. between
+        services in one process) instead of loading model_name again.
         """
         if additional_recognizers is None:
             additional_recognizers = []
 
+        self.model_name = model_name
+        self.use_gpu = use_gpu
+        self.analyzer_cache_path = analyzer_cache_path
+        self.nlp_engine = nlp_engine
+        self.cache_size = cache_size
+        self._result_cache: "OrderedDict[str, DeidentificationResult]" = (
+            OrderedDict()
+        )
+        self._result_cache_lock = threading.Lock()
+        if use_gpu:
+            self._enable_gpu()
+
         self.analyzer = self._build_analyzer(additional_recognizers)
         self.anonymizer = self._build_anonymizer()
         self.operators = self._build_operators()
+        self.replacement_tags = self._build_replacement_tags()
+
+        self._gates_lock = threading.Lock()
+        self.refresh_recognizers()
+
+        if warmup:
+            self._warmup()
+
+    def _warmup(self) -> None:
+        """
+        Analyzes WARMUP_TEXT once, discarding the results. A failure here is
+        logged only; the first real call will surface it properly.
+        """
+        try:
+            self._analyze(WARMUP_TEXT)
+        except Exception as e:
+            logger.warning(f"Warm-up failed. Error type: {type(e).__name__}")
+
+    def preload(self) -> None:
+        """
+        Prepares the service to be shared by forked workers (e.g. gunicorn
+        with preload_app). Call it in the parent process, before forking.
+
+        Warms the pipeline, then moves every live object into the garbage
+        collector's permanent generation, so collections in the workers do
+        not write to (and un-share) the model's copy-on-write pages.
+        """
+        self._warmup()
+        gc.collect()
+        gc.freeze()
+
+    def clear_cache(self) -> None:
+        """
+        Drops every cached result. Needed after swapping recognizers or the
+        analyzer on a live service, whose old results would otherwise be
+        served for repeated texts.
+        """
+        with self._result_cache_lock:
+            self._result_cache.clear()
+
+    def refresh_recognizers(self) -> None:
+        """
+        Rebuilds the entity gates (literal prefilter and run gates) from the
+        analyzer's current registry and drops the cached results.
+
+        Called automatically when a recognizer is added to or removed from
+        service.analyzer.registry; call it directly after replacing the
+        analyzer or mutating a registered recognizer.
+        """
+        with self._gates_lock:
+            self._registered = list(self.analyzer.registry.recognizers)
+            self.supported_entities = self.analyzer.get_supported_entities(
+                language="en"
+            )
+            self.literal_prefilter = self._build_literal_prefilter()
+            self.gated_entities: Set[str] = set()
+            if self.literal_prefilter is not None:
+                for entities in self.literal_prefilter.values():
+                    self.gated_entities.update(entities)
+            self.run_gates = self._build_run_gates()
+            # Always requested; gated entities are appended per text on a hit.
+            # Rebuilt with the gates, so it never outlives the registry.
+            self.ungated_entities = [
+                entity
+                for entity in self.supported_entities
+                if entity not in self.gated_entities and entity not in self.run_gates
+            ]
+        self.clear_cache()
+
+    def _enable_gpu(self) -> None:
+        """
+        Moves spaCy onto the GPU. Must run before the NLP engine is created so
+        the model weights are allocated on the device.
+        """
+        try:
+            # Share PyTorch's memory pool to limit fragmentation across calls
+            from thinc.api import set_gpu_allocator
+
+            set_gpu_allocator("pytorch")
+        except Exception as e:
+            logger.info(f"PyTorch GPU allocator not available: {e}")
+
+        try:
+            spacy.require_gpu()
+            logger.info("spaCy is running on the GPU.")
+        except Exception as e:
+            logger.warning(f"Could not enable GPU, falling back to CPU: {e}")
 
     def _build_analyzer(
         self, additional_recognizers: List[EntityRecognizer]
     ) -> AnalyzerEngine:
         """
-        Builds the Presidio AnalyzerEngine with a curated set of recognizers.
+        Builds the Presidio AnalyzerEngine with a curated set of recognizers,
+        reusing the pickled registry and NLP engine when a cache is configured.
         """
         try:
-            registry = RecognizerRegistry()
+            cached = None
+            if self.analyzer_cache_path:
+                cache_key = self._analyzer_cache_key(additional_recognizers)
+                cached = self._load_analyzer_cache(cache_key)
+
+            if cached is not None:
+                registry, nlp_engine = cached
+                if self.nlp_engine is not None:
+                    nlp_engine = self.nlp_engine
+            else:
+                registry, nlp_engine = self._build_registry(additional_recognizers)
+                if self.analyzer_cache_path:
+                    self._save_analyzer_cache(cache_key, registry, nlp_engine)
 
+            return AnalyzerEngine(
+                registry=registry, nlp_engine=nlp_engine, supported_languages=["en"]
+            )
+
+        except Exception as e:
+            logger.critical(f"Failed to build AnalyzerEngine: {e}", exc_info=True)
+            raise
+
+    def _build_registry(
+        self, additional_recognizers: List[EntityRecognizer]
+    ) -> tuple:
+        """
+        Loads the spaCy pipeline and registers the curated recognizers.
+        """
+        registry = RecognizerRegistry()
+
+        nlp_engine = self.nlp_engine
+        if nlp_engine is None:
             provider = NlpEngineProvider(
                 nlp_configuration={
                     "nlp_engine_name": "spacy",
-                    "models": [{"lang_code": "en", "model_name": "en_core_web_lg"}],
+                    "models": [{"lang_code": "en", "model_name": self.model_name}],
                 }
             )
             nlp_engine = provider.create_engine()
 
-            registry.load_predefined_recognizers(nlp_engine=nlp_engine)
+        nlp = nlp_engine.nlp["en"]
+        for pipe_name in UNUSED_SPACY_PIPES:
+            if pipe_name in nlp.pipe_names:
+                nlp.disable_pipe(pipe_name)
 
-            # --- NEW: Remove default recognizers we want to override ---
-            try:
-                registry.remove_recognizer("UsSsnRecognizer")
-                registry.remove_recognizer("UsItinRecognizer")
-                registry.remove_recognizer(
-                    "UsPassportRecognizer"
-                )  # <-- FIX: Remove default passport
-                logger.info(
-                    "Removed default UsSsn, UsItin, and UsPassport recognizers."
-                )
-            except Exception as e:
-                logger.warning(f"Could not remove default recognizers: {e}")
-            # --- End of NEW ---
+        registry.load_predefined_recognizers(nlp_engine=nlp_engine)
 
-            for recognizer in DEFAULT_HIPAA_RECOGNIZERS:
-                registry.add_recognizer(recognizer)
+        # Keep only the predefined recognizers this service needs, in one pass
+        registry.recognizers = [
+            recognizer
+            for recognizer in registry.recognizers
+            if recognizer.name in PREDEFINED_HIPAA_RECOGNIZERS
+        ]
 
-            for recognizer in additional_recognizers:
-                registry.add_recognizer(recognizer)
+        for recognizer in self._group_recognizers(
+            DEFAULT_HIPAA_RECOGNIZERS + additional_recognizers
+        ):
+            registry.add_recognizer(recognizer)
 
-            logger.info(
-                f"AnalyzerEngine created with {len(registry.recognizers)} recognizers."
-            )
+        logger.info(
+            f"AnalyzerEngine created with {len(registry.recognizers)} recognizers."
+        )
+        return registry, nlp_engine
 
-            return AnalyzerEngine(
-                registry=registry, nlp_engine=nlp_engine, supported_languages=["en"]
+    def _analyzer_cache_key(
+        self, additional_recognizers: List[EntityRecognizer]
+    ) -> str:
+        """
+        Hashes everything a cached analyzer depends on: this module's source,
+        the library versions, the spaCy model and the custom recognizers.
+        """
+        digest = hashlib.sha256()
+        with open(__file__, "rb") as source:
+            digest.update(source.read())
+        for package in ("presidio-analyzer", "spacy"):
+            digest.update(version(package).encode())
+        digest.update(self._nlp_model_id().encode())
+
+        for recognizer in additional_recognizers:
+            description = (
+                type(recognizer).__qualname__,
+                recognizer.name,
+                recognizer.supported_entities,
+                getattr(recognizer, "context", None),
+                getattr(recognizer, "global_regex_flags", None),
+                [
+                    (pattern.name, pattern.regex, pattern.score)
+                    for pattern in getattr(recognizer, "patterns", [])
+                ],
             )
+            digest.update(repr(description).encode())
+
+        return digest.hexdigest()
 
+    def _nlp_model_id(self) -> str:
+        """
+        Names the spaCy model the analyzer is built on: model_name, or, when
+        an nlp_engine is injected, the pipeline that engine actually loaded
+        (model_name is then unused and may name a different model).
+        """
+        if self.nlp_engine is None:
+            return self.model_name
+
+        pipeline = (getattr(self.nlp_engine, "nlp", None) or {}).get("en")
+        models = repr(getattr(self.nlp_engine, "models", None))
+        if pipeline is None:
+            return f"{type(self.nlp_engine).__qualname__}:{models}"
+        meta = pipeline.meta
+        return f"{models}:{meta.get('lang')}_{meta.get('name')}-{meta.get('version')}"
+
+    def _load_analyzer_cache(self, cache_key: str) -> Optional[tuple]:
+        """
+        Returns the cached (registry, nlp_engine), or None on a miss.
+        """
+        try:
+            with open(self.analyzer_cache_path, "rb") as cache_file:
+                stored_key, registry, nlp_engine = pickle.load(cache_file)
+        except FileNotFoundError:
+            return None
         except Exception as e:
-            logger.critical(f"Failed to build AnalyzerEngine: {e}", exc_info=True)
-            raise
+            logger.warning(f"Ignoring unreadable analyzer cache: {e}")
+            return None
+
+        if stored_key != cache_key:
+            logger.info("Analyzer cache is stale; rebuilding.")
+            return None
+
+        logger.info(f"Loaded AnalyzerEngine from {self.analyzer_cache_path}.")
+        return registry, nlp_engine
+
+    def _save_analyzer_cache(
+        self, cache_key: str, registry: RecognizerRegistry, nlp_engine
+    ) -> None:
+        """
+        Pickles the registry and NLP engine. Writes go to a temporary file
+        first, so concurrent processes never read a partial cache.
+        """
+        temp_path = f"{self.analyzer_cache_path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, "wb") as cache_file:
+                pickle.dump(
+                    (cache_key, registry, nlp_engine),
+                    cache_file,
+                    protocol=pickle.HIGHEST_PROTOCOL,
+                )
+            os.replace(temp_path, self.analyzer_cache_path)
+        except Exception as e:
+            logger.warning(f"Could not write analyzer cache: {e}")
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+
+    def _group_recognizers(
+        self, recognizers: List[EntityRecognizer]
+    ) -> List[EntityRecognizer]:
+        """
+        Folds plain regex recognizers into one HyperscanMultiRecognizer.
+
+        Recognizers with context words keep their own registry entry, since
+        Presidio's context enhancement looks them up by id.
+        """
+        if hyperscan is None:
+            return list(recognizers)
+
+        foldable, others = [], []
+        for recognizer in recognizers:
+            # Subclasses may override analyze(), so only plain regex ones fold.
+            if type(recognizer) in PLAIN_PATTERN_RECOGNIZERS and not recognizer.context:
+                foldable.append(recognizer)
+            else:
+                others.append(recognizer)
+
+        if not foldable:
+            return others
+
+        try:
+            multi_recognizer = HyperscanMultiRecognizer(foldable)
+        except Exception as e:
+            logger.warning(f"Could not build Hyperscan database: {e}")
+            return list(recognizers)
+
+        logger.info(f"Folded {len(foldable)} regex recognizers into Hyperscan.")
+        return [multi_recognizer] + others
+
+    def _registered_recognizers(self) -> List[EntityRecognizer]:
+        """
+        Returns the registry's recognizers, with the ones folded into a
+        HyperscanMultiRecognizer listed individually.
+        """
+        recognizers = []
+        for recognizer in self.analyzer.registry.recognizers:
+            if isinstance(recognizer, HyperscanMultiRecognizer):
+                recognizers.extend(recognizer.recognizers)
+            else:
+                recognizers.append(recognizer)
+        return recognizers
+
+    def _build_literal_prefilter(self) -> Optional["ahocorasick.Automaton"]:
+        """
+        Builds an Aho-Corasick automaton over the literal prefixes of regex
+        recognizers (e.g. "MRN-", "BCBS", "SN:").
+
+        An entity is only gated when *every* recognizer that supports it is
+        literal-anchored; otherwise it is always requested from the analyzer.
+        """
+        if ahocorasick is None:
+            return None
+
+        recognizers = self._registered_recognizers()
+        entity_literals: Dict[str, Set[str]] = {}
+        ungated: Set[str] = set()
+        for recognizer in recognizers:
+            if type(recognizer) not in PLAIN_PATTERN_RECOGNIZERS:
+                ungated.update(recognizer.supported_entities)
+                continue
+
+            entity = recognizer.supported_entities[0]
+            literals = set()
+            for pattern in recognizer.patterns:
+                prefixes = literal_prefixes(pattern.regex)
+                if prefixes is None:
+                    ungated.add(entity)
+                    break
+                literals.update(prefixes)
+            else:
+                entity_literals.setdefault(entity, set()).update(literals)
+
+        word_entities: Dict[str, Set[str]] = {}
+        for entity, literals in entity_literals.items():
+            if entity in ungated:
+                continue
+            for literal in literals:
+                word_entities.setdefault(literal, set()).add(entity)
+
+        if not word_entities:
+            return None
+
+        automaton = ahocorasick.Automaton()
+        for word, entities in word_entities.items():
+            automaton.add_word(word, tuple(sorted(entities)))
+        automaton.make_automaton()
+
+        logger.info(f"Literal prefilter gates {len(word_entities)} prefixes.")
+        return automaton
+
+    def _build_run_gates(self) -> Dict[str, "regex.Pattern"]:
+        """
+        Maps each entity whose recognizers all have a RUN_GATES entry to the
+        run regex its text must contain.
+
+        As with the literal prefilter, an entity that any other recognizer
+        supports is never gated.
+        """
+        entity_gates: Dict[str, Set["regex.Pattern"]] = {}
+        ungated: Set[str] = set()
+        for recognizer in self._registered_recognizers():
+            if type(recognizer) not in PLAIN_PATTERN_RECOGNIZERS:
+                ungated.update(recognizer.supported_entities)
+                continue
+
+            entity = recognizer.supported_entities[0]
+            for pattern in recognizer.patterns:
+                gate = RUN_GATES.get(pattern.regex)
+                if gate is None:
+                    ungated.add(entity)
+                    break
+                entity_gates.setdefault(entity, set()).add(gate)
+
+        # An entity with several gated patterns keeps its gate only if they agree.
+        return {
+            entity: next(iter(gates))
+            for entity, gates in entity_gates.items()
+            if entity not in ungated and len(gates) == 1
+        }
+
+    def _refresh_if_registry_changed(self) -> None:
+        """
+        Rebuilds the gates (and drops cached results) when recognizers were
+        added to or removed from the registry since they were built; a new
+        recognizer would otherwise never be requested.
+        """
+        if self.analyzer.registry.recognizers != self._registered:
+            self.refresh_recognizers()
+
+    def _candidate_entities(self, text: str) -> Optional[List[str]]:
+        """
+        Returns the entities worth analyzing for this text, dropping gated
+        entities whose literal prefixes or required digit runs do not appear
+        anywhere in it.
+        """
+        self._refresh_if_registry_changed()
+        if self.literal_prefilter is None and not self.run_gates:
+            return None
+
+        hits = set()
+        if self.literal_prefilter is not None:
+            for _, entities in self.literal_prefilter.iter(text.casefold()):
+                hits.update(entities)
+                if len(hits) == len(self.gated_entities):
+                    break
+        hits.update(
+            entity for entity in self.run_gates if entity not in self.gated_entities
+        )
+
+        # Several entities may share a run regex; search the text once for each.
+        has_run: Dict["regex.Pattern", bool] = {}
+        for entity, gate in self.run_gates.items():
+            if entity not in hits:
+                continue
+            if gate not in has_run:
+                has_run[gate] = gate.search(text) is not None
+            if not has_run[gate]:
+                hits.discard(entity)
+
+        return self.ungated_entities + sorted(hits)
 
     def _build_anonymizer(self) -> AnonymizerEngine:
         """
@@ -329,77 +1345,298 @@ class HIPAAMaskingService:
 
     def _build_operators(self) -> Dict[str, OperatorConfig]:
         """
-        Builds the anonymization operators with specific masking strategies.
-        """
-        operators = {
-            "DEFAULT": OperatorConfig("replace", {"new_value": "<PHI>"}),
-            "PERSON": OperatorConfig("replace", {"new_value": "<PERSON>"}),
-            "PHONE_NUMBER": OperatorConfig("replace", {"new_value": "<PHONE>"}),
-            "EMAIL_ADDRESS": OperatorConfig("replace", {"new_value": "<EMAIL>"}),
-            "US_SSN": OperatorConfig("replace", {"new_value": "<SSN>"}),
-            "SSN": OperatorConfig("replace", {"new_value": "<SSN>"}),
-            "US_ITIN": OperatorConfig("replace", {"new_value": "<ITIN>"}),
-            "US_PASSPORT": OperatorConfig(  # <-- Added operator for consistency
-                "replace", {"new_value": "<PHI>"}  # Still uses default, but good to have
-            ),
-            "DATE_TIME": OperatorConfig("replace", {"new_value": "<DATE>"}),
-            "LOCATION": OperatorConfig("replace", {"new_value": "<LOCATION>"}),
-            "MEDICAL_RECORD_NUMBER": OperatorConfig("replace", {"new_value": "<MRN>"}),
-            "ORGANIZATION": OperatorConfig("replace", {"new_value": "<ORGANIZATION>"}),
-            "URL": OperatorConfig("replace", {"new_value": "<URL>"}),
-            "CREDIT_CARD": OperatorConfig("replace", {"new_value": "<CREDIT_CARD>"}),
-            "ZIP_CODE": OperatorConfig("replace", {"new_value": "<ZIP>"}),
-            "VEHICLE_VIN": OperatorConfig("replace", {"new_value": "<VIN>"}),
-            "LICENSE_PLATE": OperatorConfig(
-                "replace", {"new_value": "<LICENSE_PLATE>"}
-            ),
-            "HEALTH_PLAN_ID": OperatorConfig("replace", {"new_value": "<HPN>"}),
-            "DEVICE_IDENTIFIER": OperatorConfig("replace", {"new_value": "<DEVICE>"}),
-        }
+        Returns the anonymization operators with specific masking strategies.
 
-        return operators
+        The OperatorConfigs are built once at import; each service gets its
+        own shallow copy of the mapping.
+        """
+        return dict(_OPERATORS)
 
-    def deidentify(self, text: str) -> Dict[str, Union[str, List[Dict]]]:
+    def _build_replacement_tags(self) -> Optional[Dict[str, str]]:
         """
-        Analyzes and de-identifies a single string of text.
+        Maps each entity type to its constant mask, when every operator is a
+        plain "replace"; otherwise returns None and Presidio's operators run.
+        """
+        tags = {}
+        for entity_type, operator in self.operators.items():
+            if operator.operator_name != "replace":
+                return None
+            tags[entity_type] = operator.params["new_value"]
+        return tags
+
+    def _mask_text(self, text: str, analyzer_results: List[RecognizerResult]) -> str:
+        """
+        Replaces every result with its tag in one left-to-right join.
+
+        Only disjoint results (the common case) take this path; overlapping
+        ones go through the public anonymize(), whose conflict resolution
+        this join does not reimplement.
+        """
+        results = sorted(
+            analyzer_results, key=lambda result: (result.start, result.end)
+        )
+        disjoint = all(result.start < result.end for result in results) and all(
+            current.end <= following.start
+            for current, following in zip(results, results[1:])
+        )
+        if self.replacement_tags is None or not disjoint:
+            return self.anonymizer.anonymize(
+                text=text,
+                analyzer_results=analyzer_results,
+                operators=self.operators,
+            ).text
+
+        default_tag = self.replacement_tags["DEFAULT"]
+        parts = []
+        position = 0
+        previous_type = None
+        for result in results:
+            gap = text[position : result.start]
+            if result.entity_type == previous_type and ANONYMIZER_SPACES_REGEX.search(
+                gap
+            ):
+                # Same-type entities separated by spaces share one tag.
+                position = result.end
+                continue
+            parts.append(gap)
+            parts.append(self.replacement_tags.get(result.entity_type, default_tag))
+            position = result.end
+            previous_type = result.entity_type
+        parts.append(text[position:])
+        return "".join(parts)
+
+    def _coerce_text(self, text: Any) -> str:
+        """
+        Normalizes the input to a string (None becomes "").
         """
         if not isinstance(text, str):
             logger.warning("De-identification called with non-string input.")
             text = str(text) if text is not None else ""
+        return text
 
-        if not text:
-            return DeidentificationResult(
-                masked_text="", entities_found=[]
-            ).model_dump()
+    def _cached_result(self, text: str) -> Optional[Dict]:
+        """
+        Returns a copy of the cached result for this text, or None.
+        """
+        if not self.cache_size or len(text) > LONG_TEXT_THRESHOLD:
+            return None
+        self._refresh_if_registry_changed()
 
-        try:
-            analyzer_results = self.analyzer.analyze(
-                text=text,
-                language="en",
-                return_decision_process=False,
+        with self._result_cache_lock:
+            result = self._result_cache.get(text)
+            if result is None:
+                return None
+            self._result_cache.move_to_end(text)
+
+        # Callers may mutate the returned dicts, so each hit gets fresh ones.
+        return result.to_dict()
+
+    def _cache_result(self, text: str, result: Dict) -> None:
+        """
+        Stores a copy of a successful result, evicting the least recently used.
+
+        Long texts are not cached: each entry pins the raw text and its masked
+        copy, so a full cache of large documents would hold gigabytes.
+        """
+        if not self.cache_size or len(text) > LONG_TEXT_THRESHOLD:
+            return
+
+        # Held as slotted dataclasses, which take well under half the memory
+        # of the equivalent dicts.
+        entry = DeidentificationResult(
+            masked_text=result["masked_text"],
+            entities_found=[
+                DeidentifiedEntity(**entity) for entity in result["entities_found"]
+            ],
+            entity_mask=result["entity_mask"],
+        )
+        with self._result_cache_lock:
+            self._result_cache[text] = entry
+            self._result_cache.move_to_end(text)
+            while len(self._result_cache) > self.cache_size:
+                self._result_cache.popitem(last=False)
+
+    def _result_without_analysis(
+        self, text: str, use_cache: bool = True
+    ) -> Optional[Dict]:
+        """
+        Returns the result for texts that need no NLP run: empty or PHI-free
+        by construction (no letters or digits), or already cached.
+        """
+        if not text or PHI_CANDIDATE_REGEX.search(text) is None:
+            return _result_dict(text)
+
+        return self._cached_result(text) if use_cache else None
+
+    def deidentify(
+        self, text: str, use_nlp: bool = True
+    ) -> Dict[str, Union[str, List[Dict]]]:
+        """
+        Analyzes and de-identifies a single string of text.
+
+        use_nlp=False skips the spaCy pipeline: only pattern recognizers run,
+        so names, locations, organizations and free-text dates are NOT
+        masked. Only use it where no NER entity can occur.
+        """
+        text = self._coerce_text(text)
+
+        # The result cache only holds full (NLP) results.
+        result = self._result_without_analysis(text, use_cache=use_nlp)
+        if result is not None:
+            return result
+
+        if not use_nlp:
+            return self._deidentify_text(
+                text, self._regex_only_artifacts(), use_cache=False
             )
 
-            anonymized_result = self.anonymizer.anonymize(
-                text=text,
-                analyzer_results=analyzer_results,
-                operators=self.operators,
+        return self._deidentify_text(text)
+
+    @staticmethod
+    def _regex_only_artifacts() -> NlpArtifacts:
+        """
+        Empty NLP artifacts: the NER recognizer finds nothing and no context
+        words are available, so no spaCy pipeline has to run.
+        """
+        return NlpArtifacts(
+            entities=[],
+            tokens=[],
+            tokens_indices=[],
+            lemmas=[],
+            nlp_engine=None,
+            language="en",
+        )
+
+    def deidentify_batch(
+        self, texts: List[str], batch_size: int = 32, use_nlp: bool = True
+    ) -> List[Dict[str, Union[str, List[Dict]]]]:
+        """
+        De-identifies a list of texts, streaming them through spaCy's
+        nlp.pipe in batches instead of running the pipeline once per text.
+
+        use_nlp=False skips the spaCy pipeline, with the same caveats as in
+        deidentify.
+        """
+        if not use_nlp:
+            return [self.deidentify(text, use_nlp=False) for text in texts]
+
+        texts = [self._coerce_text(text) for text in texts]
+        results: List[Optional[Dict]] = [
+            self._result_without_analysis(text) for text in texts
+        ]
+        pending = [i for i, result in enumerate(results) if result is None]
+
+        try:
+            batch = self.analyzer.nlp_engine.process_batch(
+                [texts[i] for i in pending], language="en", batch_size=batch_size
+            )
+            for i, (_, nlp_artifacts) in zip(pending, batch):
+                results[i] = self._deidentify_text(texts[i], nlp_artifacts)
+        except Exception as e:
+            logger.error(
+                f"Batch NLP processing failed. Error type: {type(e).__name__}"
             )
 
+        # Anything left unprocessed (the NLP batch failed) is failed safely.
+        return [
+            result
+            if result is not None
+            else _result_dict("[PROCESSING FAILED]")
+            for result in results
+        ]
+
+    def _analyze(
+        self, text: str, nlp_artifacts: Optional[NlpArtifacts] = None
+    ) -> List[RecognizerResult]:
+        """
+        Runs the spaCy pipeline (unless artifacts are given) and the analyzer.
+        """
+        if nlp_artifacts is None:
+            nlp_artifacts = self.analyzer.nlp_engine.process_text(text, "en")
+
+        return self.analyzer.analyze(
+            text=text,
+            language="en",
+            entities=self._candidate_entities(text),
+            return_decision_process=False,
+            nlp_artifacts=nlp_artifacts,
+        )
+
+    def _analyze_long(self, text: str) -> List[RecognizerResult]:
+        """
+        Analyzes a long text as overlapping chunks in parallel threads.
+
+        Each chunk only keeps the results that start in its "authority zone",
+        which stays half an overlap away from the chunk's cut edges. An entity
+        cut by one chunk boundary is therefore taken from the neighbouring
+        chunk, which sees it whole.
+        """
+        step = LONG_TEXT_CHUNK_SIZE - LONG_TEXT_CHUNK_OVERLAP
+        margin = LONG_TEXT_CHUNK_OVERLAP // 2
+
+        starts = [0]
+        while starts[-1] + LONG_TEXT_CHUNK_SIZE < len(text):
+            starts.append(starts[-1] + step)
+
+        def analyze_chunk(start: int) -> List[RecognizerResult]:
+            return self._analyze(text[start : start + LONG_TEXT_CHUNK_SIZE])
+
+        workers = min(len(starts), os.cpu_count() or 1)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            chunk_results = list(executor.map(analyze_chunk, starts))
+
+        results = []
+        for i, (start, chunk_result) in enumerate(zip(starts, chunk_results)):
+            zone_start = start + margin if i > 0 else 0
+            zone_end = starts[i + 1] + margin if i + 1 < len(starts) else len(text)
+            for result in chunk_result:
+                result.start += start
+                result.end += start
+                if zone_start <= result.start < zone_end:
+                    results.append(result)
+
+        return results
+
+    def _deidentify_text(
+        self,
+        text: str,
+        nlp_artifacts: Optional[NlpArtifacts] = None,
+        use_cache: bool = True,
+    ) -> Dict[str, Union[str, List[Dict]]]:
+        """
+        Runs the analyzer and anonymizer over a non-empty string. The spaCy
+        pipeline runs exactly once per text (or chunk), here or in
+        deidentify_batch.
+        """
+        try:
+            if (
+                nlp_artifacts is None
+                and len(text) > LONG_TEXT_THRESHOLD
+                and (os.cpu_count() or 1) > 1
+            ):
+                analyzer_results = self._analyze_long(text)
+            else:
+                analyzer_results = self._analyze(text, nlp_artifacts)
+
+            if analyzer_results:
+                masked_text = self._mask_text(text, analyzer_results)
+            else:
+                # Nothing to mask: skip the anonymizer's conflict resolution.
+                masked_text = text
+
+            # Built directly in the DeidentifiedEntity dict shape, skipping
+            # per-entity object construction and serialization.
             found_entities = [
-                DeidentifiedEntity(
-                    text=text[res.start : res.end],
-                    entity_type=res.entity_type,
-                    start=res.start,
-                    end=res.end,
-                    score=res.score,
-                )
+                {
+                    "text": text[res.start : res.end],
+                    "entity_type": res.entity_type,
+                    "start": res.start,
+                    "end": res.end,
+                    "score": res.score,
+                }
                 for res in analyzer_results
             ]
 
-            result = DeidentificationResult(
-                masked_text=anonymized_result.text, entities_found=found_entities
-            )
-
             if found_entities:
                 logger.info(
                     f"De-identification complete: Found {len(found_entities)} entities."
@@ -407,13 +1644,18 @@ class HIPAAMaskingService:
             else:
                 logger.info("De-identification complete: No entities found.")
 
-            return result.model_dump()
+            result = _result_dict(
+                masked_text,
+                found_entities,
+                entity_mask(res.entity_type for res in analyzer_results),
+            )
+            if use_cache:
+                self._cache_result(text, result)
+            return result
 
         except Exception as e:
             logger.error(
                 f"De-identification process failed. Error type: {type(e).__name__}"
             )
 
-            return DeidentificationResult(
-                masked_text="[PROCESSING FAILED]", entities_found=[]
-            ).model_dump()
\ No newline at end of file
+            return _result_dict("[PROCESSING FAILED]")
\ No newline at end of file
@@ -1,61 +1,44 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict
 from unittest.mock import MagicMock, patch
 
 import pytest
-from presidio_analyzer import AnalyzerEngine
+from presidio_analyzer import (
+    AnalyzerEngine,
+    Pattern,
+    PatternRecognizer,
+    RecognizerResult,
+)
 
 # Import the service and its components
 from hipaa_masking_service import (
     HIPAAMaskingService,
     DeidentificationResult,
+    EntityKind,
+    LONG_TEXT_THRESHOLD,
+    HyperscanMultiRecognizer,
     create_custom_mrn_recognizer,
     create_device_id_recognizer,
-    create_health_plan_recognizer,
     create_itin_recognizer,
     create_license_plate_recognizer,
-    create_vin_recognizer,
     create_zip_code_recognizer,
+    literal_prefixes,
+    literals_to_regex,
 )
 
 
-@pytest.fixture(scope="module")
-def service() -> HIPAAMaskingService:
-    """
-    Fixture to create a single instance of the service for all tests.
-    This is efficient as the NLP models are loaded only once.
-    """
-    # Create all the custom recognizers
-    custom_mrn_rec = create_custom_mrn_recognizer()
-    zip_code_rec = create_zip_code_recognizer()
-    vin_rec = create_vin_recognizer()
-    plate_rec = create_license_plate_recognizer()
-    hpn_rec = create_health_plan_recognizer()
-    device_rec = create_device_id_recognizer()
-    itin_rec = create_itin_recognizer()  # Create new ITIN recognizer
-
-    # Initialize the service with ALL custom recognizers
-    service_instance = HIPAAMaskingService(
-        additional_recognizers=[
-            custom_mrn_rec,
-            zip_code_rec,
-            vin_rec,
-            plate_rec,
-            hpn_rec,
-            device_rec,
-            itin_rec,  # Add new ITIN recognizer
-        ]
-    )
-    return service_instance
-
-
 def test_service_initialization(service: HIPAAMaskingService):
     """Test that the service and its engines are initialized correctly."""
     assert service.analyzer is not None
     assert service.anonymizer is not None
 
-    # Check if our custom recognizers were loaded
-    loaded_recognizer_names = [
-        rec.name for rec in service.analyzer.registry.recognizers
-    ]
+    # Check if our custom recognizers were loaded (directly, or folded
+    # into the HyperscanMultiRecognizer when hyperscan is installed)
+    loaded_recognizer_names = []
+    for rec in service.analyzer.registry.recognizers:
+        loaded_recognizer_names.append(rec.name)
+        if isinstance(rec, HyperscanMultiRecognizer):
+            loaded_recognizer_names.extend(r.name for r in rec.recognizers)
     assert "Custom MRN Recognizer" in loaded_recognizer_names
     assert "Custom ZIP Code Recognizer" in loaded_recognizer_names
     assert "Custom VIN Recognizer" in loaded_recognizer_names
@@ -66,6 +49,185 @@ def test_service_initialization(service: HIPAAMaskingService):
     assert "High Score SSN Recognizer" in loaded_recognizer_names  # Check for new SSN
 
 
+def test_hyperscan_matches_plain_recognizers():
+    """The Hyperscan prefilter must not change what the regexes find."""
+    pytest.importorskip("hyperscan")
+
+    recognizers = [
+        create_custom_mrn_recognizer(),
+        create_zip_code_recognizer(),
+        create_itin_recognizer(),
+    ]
+    multi = HyperscanMultiRecognizer(recognizers)
+    text = "MRN-12345 lives at 90210-1234; ITIN 942-80-1234, not MRN-123."
+
+    expected = sorted(
+        (r.entity_type, r.start, r.end)
+        for rec in recognizers
+        for r in rec.analyze(text, entities=[])
+    )
+    found = sorted(
+        (r.entity_type, r.start, r.end) for r in multi.analyze(text, entities=[])
+    )
+    assert found == expected
+    assert multi.analyze("Nothing to see here.", entities=[]) == []
+
+    # A single requested recognizer runs without the scan
+    zip_only = multi.analyze(text, entities=["ZIP_CODE"])
+    assert [(r.start, r.end) for r in zip_only] == [
+        (r.start, r.end) for r in recognizers[1].analyze(text, entities=[])
+    ]
+
+
+def test_hyperscan_scan_is_thread_safe():
+    """Threads sharing one recognizer must not share a Hyperscan scratch."""
+    pytest.importorskip("hyperscan")
+
+    recognizers = [create_custom_mrn_recognizer(), create_zip_code_recognizer()]
+    multi = HyperscanMultiRecognizer(recognizers)
+    text = "MRN-12345 lives at 90210. " * 200
+    expected = len(multi.analyze(text, entities=[]))
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        counts = list(
+            executor.map(
+                lambda _: len(multi.analyze(text, entities=[])), range(64)
+            )
+        )
+    assert counts == [expected] * 64
+
+
+def test_re2_matches_regex_module():
+    """RE2-compiled patterns must find exactly what the 'regex' module finds."""
+    pytest.importorskip("re2")
+
+    text = "MRN-12345, plate 8ABC123 / ABC-123, SN:AB-1234 x 90210"
+    for factory in (
+        create_license_plate_recognizer,
+        create_device_id_recognizer,
+    ):
+        recognizer = factory()
+        plain = PatternRecognizer(
+            supported_entity=recognizer.supported_entities[0],
+            patterns=[
+                Pattern(name=p.name, regex=p.regex, score=p.score)
+                for p in recognizer.patterns
+            ],
+            global_regex_flags=recognizer.global_regex_flags,
+        )
+        found = [(r.start, r.end) for r in recognizer.analyze(text, [])]
+        expected = [(r.start, r.end) for r in plain.analyze(text, [])]
+        assert found and found == expected
+
+
+@pytest.mark.parametrize(
+    "regex, expected",
+    [
+        (r"\b(MRN-\d{5})\b", ["mrn-"]),
+        (r"\b(?:BCBS\d{9}|HPN-\d{7})\b", ["bcbs", "hpn-"]),
+        (r"\b(SN:[A-Z0-9-]{6,})\b", ["sn:"]),
+        (r"\b(\d{3}-\d{2}-\d{4})\b", None),  # no literal prefix
+        (r"\b(9\d{2}-\d{2}-\d{4})\b", None),  # prefix too short to gate
+        (r"(?:ABC\d|\d{4})", None),  # one alternative is unanchored
+    ],
+)
+def test_literal_prefixes(regex, expected):
+    """Test the prefix extraction that feeds the Aho-Corasick prefilter."""
+    assert literal_prefixes(regex) == expected
+
+
+@pytest.mark.parametrize(
+    "words, expected",
+    [
+        (["2FAST4U", "8ABC123"], "(?:2FAST4U|8ABC123)"),
+        (["SN:", "SNO:"], "(?:SN(?::|O:))"),
+        (["UHC", "UHCP", "UHCX"], "(?:UHC(?:P|X)?)"),  # shorter word optional
+        (["A.B"], r"(?:A\.B)"),  # metacharacters are escaped
+        (["", "UHC"], "(?:UHC)"),  # empty words never match on their own
+    ],
+)
+def test_literals_to_regex(words, expected):
+    """Test the trie-compressed alternation used for literal word lists."""
+    assert literals_to_regex(words) == expected
+
+
+@pytest.mark.parametrize("words", [[], [""]])
+def test_literals_to_regex_rejects_empty_lists(words):
+    """A pattern that matches the empty string would flag every position."""
+    with pytest.raises(ValueError):
+        literals_to_regex(words)
+
+
+def test_literal_prefilter_keeps_gated_entities(service: HIPAAMaskingService):
+    """Gated entities are only requested when their prefix is present."""
+    pytest.importorskip("ahocorasick")
+
+    assert "MEDICAL_RECORD_NUMBER" in service.gated_entities
+    assert "MEDICAL_RECORD_NUMBER" not in service._candidate_entities("No ids.")
+    assert "MEDICAL_RECORD_NUMBER" in service._candidate_entities("mrn-12345")
+    # Entities without a literal anchor are always requested
+    assert "US_SSN" in service._candidate_entities("No ids.")
+
+
+def test_recognizer_added_after_construction_runs(nlp_engine):
+    """A recognizer registered on a live service is requested and masked."""
+    live = HIPAAMaskingService(
+        additional_recognizers=[
+            create_custom_mrn_recognizer(),
+            create_zip_code_recognizer(),
+        ],
+        nlp_engine=nlp_engine,
+        warmup=False,
+    )
+    text = "send to FAX123456 now"
+    live.deidentify(text)  # cached before the recognizer exists
+
+    live.analyzer.registry.add_recognizer(
+        PatternRecognizer(
+            supported_entity="FAX_NUMBER",
+            patterns=[Pattern(name="fax", regex=r"\bFAX\d{6}\b", score=0.9)],
+        )
+    )
+
+    result = live.deidentify(text)
+    assert "FAX123456" not in result["masked_text"]
+    assert "FAX_NUMBER" in {e["entity_type"] for e in result["entities_found"]}
+    assert "FAX_NUMBER" in live.gated_entities  # "FAX" prefix
+
+
+def test_ungated_entities_follow_the_registry(nlp_engine):
+    """
+    The always-requested entity list tracks recognizers added to and removed
+    from the live registry.
+    """
+    live = HIPAAMaskingService(
+        additional_recognizers=[create_custom_mrn_recognizer()],  # gated
+        nlp_engine=nlp_engine,
+        warmup=False,
+    )
+    account = PatternRecognizer(
+        supported_entity="ACCOUNT_ID",
+        patterns=[Pattern(name="account", regex=r"\b\d{7}\b", score=0.9)],
+    )
+
+    live.analyzer.registry.add_recognizer(account)
+    assert "ACCOUNT_ID" in live._candidate_entities("Account 1234567.")
+    assert "ACCOUNT_ID" in live.ungated_entities
+
+    live.analyzer.registry.remove_recognizer(account.name)
+    assert "ACCOUNT_ID" not in live._candidate_entities("Account 1234567.")
+    assert "ACCOUNT_ID" not in live.ungated_entities
+
+
+def test_run_gates_need_a_digit_run(service: HIPAAMaskingService):
+    """Run-gated entities are only requested when their digit run is present."""
+    assert set(service.run_gates) >= {"ZIP_CODE", "VEHICLE_VIN"}
+    assert "ZIP_CODE" not in service._candidate_entities("Ward 1234, bed 12.")
+    assert "ZIP_CODE" in service._candidate_entities("Lives in 90210.")
+    assert "VEHICLE_VIN" not in service._candidate_entities("ZIP 90210")
+    assert "VEHICLE_VIN" in service._candidate_entities("VIN 1HGCV1F93LA123456")
+
+
 def test_no_phi_found(service: HIPAAMaskingService):
     """Test that 'safe' text is returned unchanged."""
     text = "This is a simple sentence with no personal data."
@@ -93,27 +255,211 @@ def test_none_input(service: HIPAAMaskingService):
     assert len(result["entities_found"]) == 0
 
 
-def test_custom_mrn_recognized(service: HIPAAMaskingService):
+def test_fused_masking_matches_anonymizer(service: HIPAAMaskingService):
+    """
+    The single-pass masking must match AnonymizerEngine, with or without
+    overlapping results.
+    """
+    text = "Call John Smith at 555-123-4567 on 2025-10-28 from 10.0.0.1 now."
+    results = [
+        RecognizerResult("PERSON", 5, 9, 0.85),
+        RecognizerResult("PERSON", 10, 15, 0.85),  # merged across the space
+        RecognizerResult("PHONE_NUMBER", 19, 31, 0.75),
+        RecognizerResult("US_SSN", 23, 31, 0.5),  # contained: dropped
+        RecognizerResult("DATE_TIME", 35, 45, 0.85),
+        RecognizerResult("LOCATION", 40, 55, 0.6),  # partial overlap
+        RecognizerResult("IP_ADDRESS", 51, 59, 0.6),  # DEFAULT tag
+    ]
+
+    disjoint_results = [results[0], results[1], results[2], results[4]]
+
+    for analyzer_results in (results, disjoint_results):
+        expected = service.anonymizer.anonymize(
+            text=text,
+            analyzer_results=analyzer_results,
+            operators=dict(service.operators),
+        ).text
+        assert service._mask_text(text, analyzer_results) == expected
+
+    # Only overlapping results are handed to the anonymizer
+    with patch.object(
+        service.anonymizer, "anonymize", wraps=service.anonymizer.anonymize
+    ) as anonymize:
+        service._mask_text(text, disjoint_results)
+        anonymize.assert_not_called()
+        service._mask_text(text, results)
+        anonymize.assert_called_once()
+
+
+def test_text_without_letters_or_digits_skips_nlp(service: HIPAAMaskingService):
+    """Separator-only text is returned as-is without running spaCy."""
+    text = "  ----\n\t***  "
+
+    with patch.object(service.analyzer.nlp_engine, "process_text") as process_text:
+        result = service.deidentify(text)
+        process_text.assert_not_called()
+
+    assert result == {
+        "masked_text": text,
+        "entities_found": [],
+        "entity_mask": EntityKind(0),
+    }
+
+
+def test_use_nlp_false_skips_spacy(service: HIPAAMaskingService):
+    """use_nlp=False runs the pattern recognizers without the spaCy pipeline."""
+    text = "Regex-only check of MRN-24680."
+
+    with patch.object(service.analyzer.nlp_engine, "process_text") as process_text:
+        result = service.deidentify(text, use_nlp=False)
+        process_text.assert_not_called()
+
+    assert result["masked_text"] == "Regex-only check of <MRN>."
+    # Regex-only results never reach the (NLP) result cache
+    assert service._cached_result(text) is None
+
+
+def test_deidentify_batch_matches_single_calls(service: HIPAAMaskingService):
+    """Batched de-identification must give the same results as one-by-one."""
+    texts = [
+        "Patient John Doe (SSN: 123-45-6789) was seen on 2025-10-28.",
+        "",
+        None,
+        "This is a simple sentence with no personal data.",
+        "His file is MRN-98765. Call 555-123-4567.",
+    ]
+
+    results = service.deidentify_batch(texts)
+
+    assert results == [service.deidentify(text) for text in texts]
+
+
+def test_repeated_text_served_from_cache(service: HIPAAMaskingService):
+    """
+    A repeated text skips analysis and gets its own copy of the result,
+    until the cache is cleared.
+    """
+    text = "Repeat visit for MRN-55555."
+    first = service.deidentify(text)
+    expected_entities = [dict(e) for e in first["entities_found"]]
+    first["entities_found"].clear()
+
+    with patch.object(service.analyzer, "analyze") as analyze:
+        second = service.deidentify(text)
+        analyze.assert_not_called()
+
+    assert "<MRN>" in second["masked_text"]
+    assert second["entities_found"] == expected_entities
+
+    service.clear_cache()
+    with patch.object(service.analyzer, "analyze", return_value=[]) as analyze:
+        service.deidentify(text)
+        analyze.assert_called_once()
+
+
+def test_long_text_is_not_cached(service: HIPAAMaskingService):
+    """Texts above LONG_TEXT_THRESHOLD never enter the result cache."""
+    text = "Visit for MRN-12345. " * (LONG_TEXT_THRESHOLD // 20)
+    assert len(text) > LONG_TEXT_THRESHOLD
+
+    service.deidentify(text)
+    assert text not in service._result_cache
+
+
+def test_analyzer_cache_round_trip(tmp_path, nlp_engine):
+    """A service loaded from the analyzer cache must behave like a fresh one."""
+    cache_path = str(tmp_path / "analyzer.pkl")
+    recognizers = [create_custom_mrn_recognizer(), create_zip_code_recognizer()]
+    text = "His file is MRN-98765, ZIP 90210. SSN: 123-45-6789."
+
+    built = HIPAAMaskingService(
+        additional_recognizers=recognizers,
+        analyzer_cache_path=cache_path,
+        nlp_engine=nlp_engine,
+    )
+    with patch.object(HIPAAMaskingService, "_build_registry") as build_registry:
+        cached = HIPAAMaskingService(
+            additional_recognizers=recognizers,
+            analyzer_cache_path=cache_path,
+            nlp_engine=nlp_engine,
+        )
+        build_registry.assert_not_called()
+
+    assert cached.deidentify(text) == built.deidentify(text)
+
+
+def test_long_text_chunk_boundaries(service: HIPAAMaskingService):
+    """SSNs straddling chunk boundaries in a long text are all masked once."""
+    filler = "lorem ipsum dolor sit amet "
+    text = ""
+    for offset in [100, 7160, 7165, 8185, 8190, 14330, 16380, 20000, 23000]:
+        text += filler * ((offset - len(text)) // len(filler) + 1)
+        text += "SSN 123-45-6789 "
+    text += filler * 200
+
+    result = service.deidentify(text)
+
+    assert "123-45-6789" not in result["masked_text"]
+    assert result["masked_text"].count("<SSN>") == 9
+    ssns = [e for e in result["entities_found"] if e["entity_type"] == "US_SSN"]
+    assert len(ssns) == 9
+    assert all(text[e["start"] : e["end"]] == "123-45-6789" for e in ssns)
+
+
+def test_analyzer_cache_key_follows_injected_engine(nlp_engine):
+    """
+    With an injected nlp_engine, the cache key names that engine's model, not
+    model_name, so the cached pipeline is never loaded for another model.
+    """
+    default = HIPAAMaskingService.__new__(HIPAAMaskingService)
+    default.model_name = "en_core_web_sm"
+    default.nlp_engine = None
+
+    injected = HIPAAMaskingService.__new__(HIPAAMaskingService)
+    injected.model_name = "en_core_web_sm"
+    injected.nlp_engine = nlp_engine
+
+    assert injected._analyzer_cache_key([]) != default._analyzer_cache_key([])
+
+
+def test_long_text_parallel_chunks_do_not_fail(service: HIPAAMaskingService):
+    """
+    Chunks analyzed on parallel threads share the Hyperscan recognizer; that
+    must not fail the document. Small chunks keep many scans in flight.
+    """
+    pytest.importorskip("hyperscan")
+
+    text = ("lorem ipsum dolor sit amet " * 20 + "MRN-12345. ") * 40
+    with patch("hipaa_masking_service.os.cpu_count", return_value=8), patch(
+        "hipaa_masking_service.LONG_TEXT_CHUNK_SIZE", 512
+    ), patch("hipaa_masking_service.LONG_TEXT_CHUNK_OVERLAP", 64):
+        for _ in range(20):
+            result = service._deidentify_text(text, use_cache=False)
+            assert result["masked_text"] != "[PROCESSING FAILED]"
+            assert result["masked_text"].count("<MRN>") == 40
+
+
+@pytest.mark.regex_only
+def test_custom_mrn_recognized(deidentify: Callable[[str], Dict]):
     """Test that our custom MRN (MRN-#####) is found and masked."""
     text = "The patient's ID is MRN-12345."
     expected_mask = "The patient's ID is <MRN>."
 
-    result = service.deidentify(text)
+    result = deidentify(text)
 
     assert result["masked_text"] == expected_mask
     assert len(result["entities_found"]) >= 1  # At least 1
 
-    entity_types = {e["entity_type"] for e in result["entities_found"]}
-    assert "MEDICAL_RECORD_NUMBER" in entity_types
+    assert EntityKind.MEDICAL_RECORD_NUMBER in result["entity_mask"]
 
 
-def test_custom_mrn_negative(service: HIPAAMaskingService):
+@pytest.mark.regex_only
+def test_custom_mrn_negative(deidentify: Callable[[str], Dict]):
     """Test that improperly formatted MRNs are not flagged."""
     text = "A file is marked MRN-123 (too short) and MRN-123456 (too long)."
-    result = service.deidentify(text)
+    result = deidentify(text)
 
-    entity_types = {e["entity_type"] for e in result["entities_found"]}
-    assert "MEDICAL_RECORD_NUMBER" not in entity_types
+    assert EntityKind.MEDICAL_RECORD_NUMBER not in result["entity_mask"]
 
 
 def test_full_phi_golden_path_precise(service: HIPAAMaskingService):
@@ -128,20 +474,18 @@ def test_full_phi_golden_path_precise(service: HIPAAMaskingService):
     result = service.deidentify(text)
     entities = result["entities_found"]
 
-    entity_types_found = {e["entity_type"] for e in entities}
-
-    expected_types = {
-        "PERSON",
-        "US_SSN",
-        "DATE_TIME",
-        "MEDICAL_RECORD_NUMBER",
-        "PHONE_NUMBER",
-    }
+    expected_mask = (
+        EntityKind.PERSON
+        | EntityKind.US_SSN
+        | EntityKind.DATE_TIME
+        | EntityKind.MEDICAL_RECORD_NUMBER
+        | EntityKind.PHONE_NUMBER
+    )
 
     assert len(entities) >= 5, f"Expected at least 5 entities, found {len(entities)}"
-    assert expected_types.issubset(
-        entity_types_found
-    ), f"Missing one of the expected types in {entity_types_found}"
+    assert (
+        result["entity_mask"] & expected_mask == expected_mask
+    ), f"Missing one of the expected types in {result['entity_mask']!r}"
 
     assert "John Doe" not in result["masked_text"]
     assert "123-45-6789" not in result["masked_text"]
@@ -158,7 +502,7 @@ def test_full_phi_golden_path_precise(service: HIPAAMaskingService):
 
 @patch("hipaa_masking_service.logger")  # Mock the logger
 def test_deidentify_failure_security(
-    mock_logger: MagicMock, service: HIPAAMaskingService
+    mock_logger: MagicMock, stub_service: HIPAAMaskingService
 ):
     """
     Test the critical security feature: ensure that if the
@@ -166,102 +510,172 @@ def test_deidentify_failure_security(
     leak PHI in the logs.
     """
     text = "This is some PHI: MRN-12345."
+    stub_service.analyzer.analyze.side_effect = Exception("Mocked Analyzer Failure")
 
-    with patch.object(
-        service.analyzer, "analyze", side_effect=Exception("Mocked Analyzer Failure")
-    ):
-        result = service.deidentify(text)
+    result = stub_service.deidentify(text)
 
-        assert result["masked_text"] == "[PROCESSING FAILED]"
-        assert len(result["entities_found"]) == 0
+    assert result["masked_text"] == "[PROCESSING FAILED]"
+    assert len(result["entities_found"]) == 0
 
-        mock_logger.error.assert_called_once_with(
-            "De-identification process failed. Error type: Exception"
-        )
+    mock_logger.error.assert_called_once_with(
+        "De-identification process failed. Error type: Exception"
+    )
 
 
 # --- Start of New In-Depth Tests ---
 
+DEFAULT_RECOGNIZER_CASES = [
+    # US_SSN
+    (
+        "His SSN is 987-65-4321.",
+        "His <ORGANIZATION> is <SSN>.",
+        "US_SSN",
+    ),  # spaCy sees "SSN" as ORG
+    # PHONE_NUMBER
+    ("Call (555) 123-4567 for info.", "Call <PHONE> for info.", "PHONE_NUMBER"),
+    ("Number is 555.123.4567.", "Number is <PHONE>.", "PHONE_NUMBER"),
+    ("Number is 555-123-4567.", "Number is <PHONE>.", "PHONE_NUMBER"),
+    # EMAIL_ADDRESS
+    # UPDATED: Account for spaCy tagging "Email" as PERSON
+    ("Email me at patient@example.com.", "<PERSON> me at <EMAIL>.", "EMAIL_ADDRESS"),
+    # US_LICENSE_DRIVER
+    (
+        "License is I1234567.",
+        "License is <PHI>.",
+        "US_DRIVER_LICENSE",
+    ),  # <-- FIXED Entity Type
+    # US_ITIN (FIXED)
+    # Use a valid ITIN format (9xx-80-xxxx)
+    # SpaCy still sees "ITIN" as an ORGANIZATION, which is OK.
+    ("ITIN: 942-80-1234.", "<ORGANIZATION>: <ITIN>.", "US_ITIN"),
+    # US_PASSPORT
+    ("Passport # 123456789.", "Passport # <PHI>.", "US_PASSPORT"),
+    # IP_ADDRESS
+    # UPDATED: Account for spaCy tagging "IP" as ORGANIZATION
+    (
+        "Their IP was 192.168.1.1.",
+        "Their <ORGANIZATION> was <PHI>.",
+        "IP_ADDRESS",
+    ),
+]
+
+BUILT_IN_HIPAA_CASES = [
+    # URL (HIPAA Identifier #14)
+    (
+        "Patient was referred to http://example.com for info.",
+        "Patient was referred to <URL> for info.",
+        "URL",
+    ),
+    # ACCOUNT_NUMBER / CREDIT_CARD (HIPAA Identifier #10)
+    (
+        "Payment made with card 4111-1111-1111-1111.",
+        "Payment made with card <CREDIT_CARD>.",
+        "CREDIT_CARD",
+    ),
+]
+
+CUSTOM_REGEX_CASES = [
+    # ZIP_CODE (HIPAA Identifier #2)
+    ("The address is 123 Main St, Anytown, 90210.", "<ZIP>", "ZIP_CODE"),
+    ("He lives in 12345.", "<ZIP>", "ZIP_CODE"),
+    ("Use zip 12345-6789.", "<ZIP>", "ZIP_CODE"),
+    # VEHICLE_VIN (HIPAA Identifier #12)
+    ("The patient's car VIN is 1GKS1EK01E1234567.", "<VIN>", "VEHICLE_VIN"),
+    ("Found VIN 987ABC654DEF321XY.", "<VIN>", "VEHICLE_VIN"),
+    # LICENSE_PLATE (HIPAA Identifier #12)
+    ("Her plate is ABC-123.", "<LICENSE_PLATE>", "LICENSE_PLATE"),
+    ("License plate 2FAST4U.", "<LICENSE_PLATE>", "LICENSE_PLATE"),
+    ("Car plate was 8ABC123.", "<LICENSE_PLATE>", "LICENSE_PLATE"),
+    # HEALTH_PLAN_ID (HIPAA Identifier #9)
+    ("Member ID is BCBS123456789.", "<HPN>", "HEALTH_PLAN_ID"),
+    ("Plan number HPN-9876543.", "<HPN>", "HEALTH_PLAN_ID"),
+    ("ID: UHC123456.", "<HPN>", "HEALTH_PLAN_ID"),
+    # DEVICE_IDENTIFIER (HIPAA Identifier #13)
+    ("Serial number is SN:ABC-12345.", "<DEVICE>", "DEVICE_IDENTIFIER"),
+    ("DeviceID:9876-ABCD.", "<DEVICE>", "DEVICE_IDENTIFIER"),
+    # Full-width and Arabic-Indic digits (IME input, pasted text)
+    ("He lives in ９０２１０.", "<ZIP>", "ZIP_CODE"),
+    ("He lives in ٩٠٢١٠.", "<ZIP>", "ZIP_CODE"),
+    ("Member ID is BCBS１２３４５６７８９.", "<HPN>", "HEALTH_PLAN_ID"),
+    ("File MRN-１２３４５ attached.", "<MRN>", "MEDICAL_RECORD_NUMBER"),
+    ("SSN １２３-４５-６７８９ on file.", "<SSN>", "US_SSN"),
+]
+
+NLP_CASES = [
+    # PERSON (NLP)
+    ("The patient is Jane Smith.", "The patient is <PERSON>.", "PERSON"),
+    # DATE_TIME (NLP)
+    # UPDATED: spaCy sees "Nov 5th" and "2025" as two separate dates.
+    ("He was seen on Nov 5th, 2025.", "He was seen on <DATE>, <DATE>.", "DATE_TIME"),
+    ("She arrived yesterday.", "She arrived <DATE>.", "DATE_TIME"),
+    ("Discharge date: 2024-01-01.", "Discharge date: <DATE>.", "DATE_TIME"),
+    # LOCATION (NLP)
+    ("He lives in New York City.", "He lives in <LOCATION>.", "LOCATION"),
+    # UPDATED: This is handled by the special 'if' case below now
+    (
+        "Address: 123 Main St, Anytown.",
+        "Address: 123 <LOCATION>, <LOCATION>.",
+        "LOCATION",
+    ),  # SpaCy may find two
+    # ORGANIZATION (NLP)
+    ("Transfer from Mercy Hospital.", "Transfer from <ORGANIZATION>.", "ORGANIZATION"),
+    ("Patient works at Google.", "Patient works at <ORGANIZATION>.", "ORGANIZATION"),
+]
+
+
+@pytest.fixture(scope="module")
+def results_table(service: HIPAAMaskingService) -> Dict[str, Dict]:
+    """
+    De-identifies the texts of every case table below up front, with one
+    deidentify_batch call per mode: the NLP-dependent cases go through spaCy
+    as a single nlp.pipe batch, the regex-only ones skip spaCy altogether.
+    """
+    nlp_texts = [
+        case[0]
+        for cases in (DEFAULT_RECOGNIZER_CASES, NLP_CASES)
+        for case in cases
+    ]
+    regex_texts = [
+        case[0]
+        for cases in (BUILT_IN_HIPAA_CASES, CUSTOM_REGEX_CASES)
+        for case in cases
+    ]
+    table = dict(zip(nlp_texts, service.deidentify_batch(nlp_texts)))
+    table.update(
+        zip(regex_texts, service.deidentify_batch(regex_texts, use_nlp=False))
+    )
+    return table
+
 
 @pytest.mark.parametrize(
-    "text, expected_mask, expected_type",
-    [
-        # US_SSN
-        (
-            "His SSN is 987-65-4321.",
-            "His <ORGANIZATION> is <SSN>.",
-            "US_SSN",
-        ),  # spaCy sees "SSN" as ORG
-        # PHONE_NUMBER
-        ("Call (555) 123-4567 for info.", "Call <PHONE> for info.", "PHONE_NUMBER"),
-        ("Number is 555.123.4567.", "Number is <PHONE>.", "PHONE_NUMBER"),
-        ("Number is 555-123-4567.", "Number is <PHONE>.", "PHONE_NUMBER"),
-        # EMAIL_ADDRESS
-        # UPDATED: Account for spaCy tagging "Email" as PERSON
-        ("Email me at patient@example.com.", "<PERSON> me at <EMAIL>.", "EMAIL_ADDRESS"),
-        # US_LICENSE_DRIVER
-        (
-            "License is I1234567.",
-            "License is <PHI>.",
-            "US_DRIVER_LICENSE",
-        ),  # <-- FIXED Entity Type
-        # US_ITIN (FIXED)
-        # Use a valid ITIN format (9xx-80-xxxx)
-        # SpaCy still sees "ITIN" as an ORGANIZATION, which is OK.
-        ("ITIN: 942-80-1234.", "<ORGANIZATION>: <ITIN>.", "US_ITIN"),
-        # US_PASSPORT
-        ("Passport # 123456789.", "Passport # <PHI>.", "US_PASSPORT"),
-        # IP_ADDRESS
-        # UPDATED: Account for spaCy tagging "IP" as ORGANIZATION
-        (
-            "Their IP was 192.168.1.1.",
-            "Their <ORGANIZATION> was <PHI>.",
-            "IP_ADDRESS",
-        ),
-    ],
+    "text, expected_mask, expected_type", DEFAULT_RECOGNIZER_CASES
 )
 def test_default_recognizers(
-    service: HIPAAMaskingService, text, expected_mask, expected_type
+    results_table: Dict[str, Dict], text, expected_mask, expected_type
 ):
     """Test each of the regex-based recognizers in DEFAULT_HIPAA_RECOGNIZERS."""
-    result = service.deidentify(text)
+    result = results_table[text]
 
     assert result["masked_text"] == expected_mask
 
-    found_types = {e["entity_type"] for e in result["entities_found"]}
-    assert expected_type in found_types
+    assert EntityKind[expected_type] in result["entity_mask"]
 
 
 @pytest.mark.parametrize(
-    "text, expected_mask, expected_type",
-    [
-        # URL (HIPAA Identifier #14)
-        (
-            "Patient was referred to http://example.com for info.",
-            "Patient was referred to <URL> for info.",
-            "URL",
-        ),
-        # ACCOUNT_NUMBER / CREDIT_CARD (HIPAA Identifier #10)
-        (
-            "Payment made with card 4111-1111-1111-1111.",
-            "Payment made with card <CREDIT_CARD>.",
-            "CREDIT_CARD",
-        ),
-    ],
+    "text, expected_mask, expected_type", BUILT_IN_HIPAA_CASES
 )
 def test_built_in_hipaa_recognizers(
-    service: HIPAAMaskingService, text, expected_mask, expected_type
+    results_table: Dict[str, Dict], text, expected_mask, expected_type
 ):
     """
     Test for new HIPAA identifiers (URL, Account Numbers) that we
     added to the service.
     """
-    result = service.deidentify(text)
+    result = results_table[text]
 
     assert result["masked_text"] == expected_mask
 
-    found_types = {e["entity_type"] for e in result["entities_found"]}
-    assert expected_type in found_types
+    assert EntityKind[expected_type] in result["entity_mask"]
 
 
 # --- TDD Tests for NEW Custom Identifiers ---
@@ -269,81 +683,39 @@ def test_built_in_hipaa_recognizers(
 
 
 @pytest.mark.parametrize(
-    "text, expected_mask_contains, expected_type",
-    [
-        # ZIP_CODE (HIPAA Identifier #2)
-        ("The address is 123 Main St, Anytown, 90210.", "<ZIP>", "ZIP_CODE"),
-        ("He lives in 12345.", "<ZIP>", "ZIP_CODE"),
-        ("Use zip 12345-6789.", "<ZIP>", "ZIP_CODE"),
-        # VEHICLE_VIN (HIPAA Identifier #12)
-        ("The patient's car VIN is 1GKS1EK01E1234567.", "<VIN>", "VEHICLE_VIN"),
-        ("Found VIN 987ABC654DEF321XY.", "<VIN>", "VEHICLE_VIN"),
-        # LICENSE_PLATE (HIPAA Identifier #12)
-        ("Her plate is ABC-123.", "<LICENSE_PLATE>", "LICENSE_PLATE"),
-        ("License plate 2FAST4U.", "<LICENSE_PLATE>", "LICENSE_PLATE"),
-        ("Car plate was 8ABC123.", "<LICENSE_PLATE>", "LICENSE_PLATE"),
-        # HEALTH_PLAN_ID (HIPAA Identifier #9)
-        ("Member ID is BCBS123456789.", "<HPN>", "HEALTH_PLAN_ID"),
-        ("Plan number HPN-9876543.", "<HPN>", "HEALTH_PLAN_ID"),
-        ("ID: UHC123456.", "<HPN>", "HEALTH_PLAN_ID"),
-        # DEVICE_IDENTIFIER (HIPAA Identifier #13)
-        ("Serial number is SN:ABC-12345.", "<DEVICE>", "DEVICE_IDENTIFIER"),
-        ("DeviceID:9876-ABCD.", "<DEVICE>", "DEVICE_IDENTIFIER"),
-    ],
+    "text, expected_mask_contains, expected_type", CUSTOM_REGEX_CASES
 )
 def test_new_custom_regex_recognizers(
-    service: HIPAAMaskingService, text, expected_mask_contains, expected_type
+    results_table: Dict[str, Dict], text, expected_mask_contains, expected_type
 ):
     """
     Test for new *custom* HIPAA identifiers (ZIP, VIN, Plate, HPN, Device)
     that we have now added to the service.
     """
-    result = service.deidentify(text)
+    result = results_table[text]
 
     # Check that the mask is present in the text
     assert expected_mask_contains in result["masked_text"]
 
     # Check that the entity type was found
-    found_types = {e["entity_type"] for e in result["entities_found"]}
-    assert expected_type in found_types
+    assert EntityKind[expected_type] in result["entity_mask"]
 
 
 # --- End of TDD Tests ---
 
 
 @pytest.mark.parametrize(
-    "text, expected_mask, expected_type",
-    [
-        # PERSON (NLP)
-        ("The patient is Jane Smith.", "The patient is <PERSON>.", "PERSON"),
-        # DATE_TIME (NLP)
-        # UPDATED: spaCy sees "Nov 5th" and "2025" as two separate dates.
-        ("He was seen on Nov 5th, 2025.", "He was seen on <DATE>, <DATE>.", "DATE_TIME"),
-        ("She arrived yesterday.", "She arrived <DATE>.", "DATE_TIME"),
-        ("Discharge date: 2024-01-01.", "Discharge date: <DATE>.", "DATE_TIME"),
-        # LOCATION (NLP)
-        ("He lives in New York City.", "He lives in <LOCATION>.", "LOCATION"),
-        # UPDATED: This is handled by the special 'if' case below now
-        (
-            "Address: 123 Main St, Anytown.",
-            "Address: 123 <LOCATION>, <LOCATION>.",
-            "LOCATION",
-        ),  # SpaCy may find two
-        # ORGANIZATION (NLP)
-        ("Transfer from Mercy Hospital.", "Transfer from <ORGANIZATION>.", "ORGANIZATION"),
-        ("Patient works at Google.", "Patient works at <ORGANIZATION>.", "ORGANIZATION"),
-    ],
+    "text, expected_mask, expected_type", NLP_CASES
 )
 def test_nlp_recognizers(
-    service: HIPAAMaskingService, text, expected_mask, expected_type
+    results_table: Dict[str, Dict], text, expected_mask, expected_type
 ):
     """Test the SpaCy-based NLP recognizers."""
-    result = service.deidentify(text)
+    result = results_table[text]
 
-    found_types = {e["entity_type"] for e in result["entities_found"]}
     assert (
-        expected_type in found_types
-    ), f"Expected type {expected_type} not in {found_types}"
+        EntityKind[expected_type] in result["entity_mask"]
+    ), f"Expected type {expected_type} not in {result['entity_mask']!r}"
 
     # UPDATED: Check for the '123 Main St' case specifically
     if expected_type == "LOCATION" and "123 Main St" in text:
@@ -399,6 +771,5 @@ def test_phi_at_start_and_end(service: HIPAAMaskingService):
 
     assert result["masked_text"] == expected_mask
 
-    entity_types = {e["entity_type"] for e in result["entities_found"]}
-    assert "US_SSN" in entity_types
-    assert "PERSON" in entity_types
\ No newline at end of file
+    assert EntityKind.US_SSN in result["entity_mask"]
+    assert EntityKind.PERSON in result["entity_mask"]
\ No newline at end of file